@@ -0,0 +1,71 @@
+"""
+Per-call OCR latency for each available backend.
+
+    python benchmarks/bench_ocr.py                 # synthetic text image
+    python benchmarks/bench_ocr.py screenshot.png  # your own image
+    python benchmarks/bench_ocr.py --screen        # live capture of the primary monitor
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from overlay_ai.services.ocr_service import PytesseractBackend, TesserocrBackend, _gray
+
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "10"))
+
+def synthetic_image(width=1600, height=900):
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for row in range(40):
+        draw.text((20, 20 + row * 21), f"Line {row}: Error E-{1000 + row} in module settings/network (retry {row % 3})", fill="black")
+    return image
+
+def load_image(args):
+    if "--screen" in args:
+        from overlay_ai.services.capture_service import capture_screen
+        return capture_screen()
+    paths = [a for a in args if not a.startswith("--")]
+    if paths:
+        return Image.open(paths[0]).convert("RGB")
+    return synthetic_image()
+
+def bench(backend, gray):
+    backend.read_text(gray)  # first call pays engine/model load; reported separately
+    samples = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        backend.read_text(gray)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def main():
+    image = load_image(sys.argv[1:])
+    gray = _gray(np.asarray(image), False)
+    print(f"Image {image.size[0]}x{image.size[1]}, {ITERATIONS} iterations")
+
+    for factory in (PytesseractBackend, TesserocrBackend):
+        try:
+            started = time.perf_counter()
+            backend = factory()
+            setup = time.perf_counter() - started
+        except Exception as e:
+            print(f"{factory.name:12s} unavailable: {e}")
+            continue
+        samples = bench(backend, gray)
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(
+            f"{backend.name:12s} setup={setup * 1000:7.1f}ms "
+            f"mean={statistics.mean(samples) * 1000:7.1f}ms "
+            f"p50={statistics.median(samples) * 1000:7.1f}ms p95={p95 * 1000:7.1f}ms"
+        )
+        backend.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Recall and latency of the manual-store index types on synthetic embeddings.
+
+    python benchmarks/bench_rag_index.py
+    BENCH_VECTORS=200000 BENCH_DIM=1536 python benchmarks/bench_rag_index.py
+
+Exact (flat) search is the ground truth; recall@k is the fraction of its top-k
+each index type also returns. Tune RAG_IVF_NPROBE / RAG_HNSW_EF_SEARCH / RAG_PQ_M
+through the usual environment variables and re-run.
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from overlay_ai.services.vector_index import INDEX_TYPES, build_index
+
+VECTORS = int(os.getenv("BENCH_VECTORS", "50000"))
+DIM = int(os.getenv("BENCH_DIM", "768"))
+QUERIES = int(os.getenv("BENCH_QUERIES", "200"))
+K = int(os.getenv("BENCH_K", "3"))
+
+def clustered_vectors(count, dim, clusters=200, seed=0):
+    # Real chunk embeddings cluster by topic; uniform noise would flatter IVF/PQ
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    return centers[labels] + 0.3 * rng.normal(size=(count, dim)).astype(np.float32)
+
+def main():
+    data = clustered_vectors(VECTORS, DIM)
+    queries = clustered_vectors(QUERIES, DIM, seed=1)
+    print(f"{VECTORS} vectors x {DIM} dims, {QUERIES} queries, k={K}")
+
+    truth = None
+    for index_type in INDEX_TYPES:
+        started = time.perf_counter()
+        index = build_index(data, index_type)
+        build = time.perf_counter() - started
+
+        latencies = []
+        results = []
+        for query in queries:
+            started = time.perf_counter()
+            _, ids = index.search(query.reshape(1, -1), K)
+            latencies.append(time.perf_counter() - started)
+            results.append(set(ids[0].tolist()))
+
+        if truth is None:
+            truth = results
+        recall = statistics.mean(len(r & t) / K for r, t in zip(results, truth))
+        latencies.sort()
+        print(
+            f"{index_type:6s} build={build:7.2f}s "
+            f"p50={statistics.median(latencies) * 1000:7.3f}ms "
+            f"p95={latencies[int(len(latencies) * 0.95)] * 1000:7.3f}ms "
+            f"recall@{K}={recall:.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,29 @@
+# Must come first so every later import is timed (OVERLAY_PROFILE_STARTUP=1)
+from overlay_ai.utils import startup_profile
+startup_profile.install()
+
 import sys
 import os
 import threading
 import keyboard
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QIcon, QPixmap, QColor
-from PySide6.QtCore import Signal, QObject, Slot
+from PySide6.QtCore import Signal, QObject, Slot, QTimer
 
 from overlay_ai.ui.overlay_window import OverlayWindow
 from overlay_ai.ui.chat_widget import ChatWidget
 from overlay_ai.ui.tray_icon import SystemTray
+from overlay_ai.services.warmup import start_background_warmup
+from overlay_ai.utils import metrics
 
 # Signal helper to handle hotkey from a different thread
 class HotkeySignal(QObject):
     triggered = Signal()
 
+# Signal helper to report background model loading to the UI thread
+class ModelStatusSignal(QObject):
+    changed = Signal(str)
+
 def create_placeholder_icon():
     pixmap = QPixmap(64, 64)
     pixmap.fill(QColor("#7C4DFF"))
@@ -44,8 +54,12 @@ def main():
     tray.toggle_requested.connect(toggle_overlay)
     
     def clear_data():
-        from overlay_ai.services.rag_service import rag_service
-        msg = rag_service.clear_index()
+        from overlay_ai.services.rag_service import get_rag_service
+        from overlay_ai.services.response_cache import response_cache
+        msg = get_rag_service().clear_index()
+        response_cache.clear()
+        if chat_widget.store is not None:
+            chat_widget.store.clear()
         chat_widget.clear_history()
         chat_widget.add_message(f"Data Cleared: {msg}", is_user=False)
         
@@ -70,6 +84,15 @@ def main():
             keyboard.unhook_all()
         except:
             pass
+        # Stop streaming answers so their threads can exit
+        chat_widget.cancel_request(announce=False)
+        for worker in chat_widget._background_workers:
+            worker.cancel()
+        from overlay_ai.services.capture_service import get_capture_engine
+        get_capture_engine().close()
+        if chat_widget.store is not None:
+            # Queued messages must be written before os._exit
+            chat_widget.store.close()
             
     app.aboutToQuit.connect(cleanup)
 
@@ -77,6 +100,22 @@ def main():
     # Let's show it once so user knows it exists
     print("Starting Overlay...")
     overlay.show()
+
+    metrics.record_timing("startup.window_shown", startup_profile.since_start())
+
+    # Services (index, OCR engine, clients, local model) are built in the background
+    # once the event loop is running, instead of before the window can appear
+    model_status = ModelStatusSignal()
+    model_status.changed.connect(tray.set_model_status)
+    model_status.changed.connect(overlay.set_status)
+
+    def on_warm():
+        metrics.record_timing("startup.warm", startup_profile.since_start())
+        if startup_profile.ENABLED:
+            print(startup_profile.format_report())
+            print(metrics.format_report())
+
+    QTimer.singleShot(0, lambda: start_background_warmup(model_status.changed.emit, on_warm))
     
     exit_code = app.exec()
     print("Exiting...")
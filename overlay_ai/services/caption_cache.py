@@ -0,0 +1,143 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from overlay_ai.utils.config import CAPTION_CACHE_PATH, CAPTION_CACHE_SIZE, CAPTION_CACHE_MAX_DISTANCE
+from overlay_ai.utils.imagehash import dhash, hamming_distance
+from overlay_ai.utils import metrics
+
+def content_hash(pil_image):
+    """SHA-256 of the decoded pixels, so the same image re-encoded in another PDF still matches."""
+    image = pil_image if pil_image.mode in ("RGB", "RGBA", "L") else pil_image.convert("RGB")
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+class CaptionCache:
+    """
+    On-disk cache of image captions keyed by image content and captioning model.
+    With `max_distance` > 0, near-identical images (difference hash within that many
+    bits) also reuse the caption of the closest cached image. That is opt-in: a 9x8
+    difference hash cannot tell apart different dialogs with the same layout.
+    """
+
+    def __init__(self, path=CAPTION_CACHE_PATH, max_entries=CAPTION_CACHE_SIZE, max_distance=CAPTION_CACHE_MAX_DISTANCE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        # model -> {content_hash: dhash}, kept in memory for near-duplicate scans
+        self._hashes = {}
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS captions ("
+                " content_hash TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " dhash INTEGER NOT NULL,"
+                " caption TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (content_hash, model))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS captions_last_used ON captions(last_used)")
+            self._conn.commit()
+            for key, model, value in self._conn.execute("SELECT content_hash, model, dhash FROM captions"):
+                self._hashes.setdefault(model, {})[key] = _to_unsigned(value)
+        return self._conn
+
+    def _closest(self, model, image_dhash):
+        best_key, best_distance = None, self.max_distance + 1
+        for key, value in self._hashes.get(model, {}).items():
+            distance = hamming_distance(image_dhash, value)
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def get(self, pil_image, model, key=None):
+        """Returns the cached caption or None. `key` may pass a precomputed content_hash."""
+        key = key or content_hash(pil_image)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT caption FROM captions WHERE content_hash = ? AND model = ?", (key, model)).fetchone()
+            matched = key
+            if row is None and self.max_distance > 0:
+                matched = self._closest(model, dhash(pil_image))
+                if matched is not None:
+                    row = conn.execute("SELECT caption FROM captions WHERE content_hash = ? AND model = ?", (matched, model)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                metrics.increment("caption_cache.misses")
+                return None
+
+            if matched == key:
+                self.hits += 1
+                metrics.increment("caption_cache.hits")
+            else:
+                self.near_hits += 1
+                metrics.increment("caption_cache.near_hits")
+            conn.execute(
+                "UPDATE captions SET last_used = ?, hits = hits + 1 WHERE content_hash = ? AND model = ?",
+                (time.time(), matched, model)
+            )
+            conn.commit()
+            return row[0]
+
+    def put(self, pil_image, model, caption, key=None):
+        key = key or content_hash(pil_image)
+        image_dhash = dhash(pil_image)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO captions (content_hash, model, dhash, caption, created_at, last_used, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, model, _to_signed(image_dhash), caption, now, now)
+            )
+            self._hashes.setdefault(model, {})[key] = image_dhash
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        rows = conn.execute("SELECT content_hash, model FROM captions ORDER BY last_used LIMIT ?", (excess,)).fetchall()
+        conn.executemany("DELETE FROM captions WHERE content_hash = ? AND model = ?", rows)
+        for key, model in rows:
+            self._hashes.get(model, {}).pop(key, None)
+        metrics.increment("caption_cache.evictions", len(rows))
+
+    def stats(self):
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "near_hits": self.near_hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM captions")
+            conn.commit()
+            self._hashes = {}
+
+# Singleton instance
+caption_cache = CaptionCache()
@@ -1,16 +1,137 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import mss
 import mss.tools
+import numpy as np
 from PIL import Image
+from overlay_ai.services.encoding_service import downscale
+from overlay_ai.utils.config import CAPTURE_MONITOR
+from overlay_ai.utils import metrics
+
+class Frame:
+    """
+    One captured monitor.
+    `bgra` is a zero-copy NumPy view (height, width, 4) over the buffer mss returned;
+    PIL images are only built on demand.
+    """
+
+    def __init__(self, raw, size, monitor_index, monitor):
+        self.raw = raw
+        self.size = size
+        self.monitor_index = monitor_index
+        self.left = monitor["left"]
+        self.top = monitor["top"]
+        self.captured_at = time.time()
+        self.bgra = np.frombuffer(raw, dtype=np.uint8).reshape(size[1], size[0], 4)
+        self._image = None
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    def _bgrx_view(self):
+        # PIL only maps a buffer without copying for a few modes. RGBX is one of them;
+        # the bands are really B, G, R, A, which downscaled() swaps back after resizing.
+        return Image.frombuffer("RGBX", self.size, self.raw, "raw", "RGBX", 0, 1)
+
+    def to_image(self):
+        """Full-resolution RGB PIL image (one conversion copy, cached)."""
+        if self._image is None:
+            self._image = Image.frombytes("RGB", self.size, self.raw, "raw", "BGRX")
+        return self._image
+
+    def downscaled(self, max_edge):
+        """
+        RGB image no larger than `max_edge`, resized straight from the capture buffer
+        so only the small result is channel-converted.
+        """
+        if self._image is not None:
+            return downscale(self._image, max_edge)
+        resized = downscale(self._bgrx_view(), max_edge)
+        b, g, r, _ = resized.split()
+        return Image.merge("RGB", (r, g, b))
+
+class CaptureEngine:
+    """
+    Long-lived screen grabber.
+    mss handles are not thread-safe, so one handle is kept per thread and reused for every grab.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.sct = sct
+            with self._lock:
+                self._handles.append(sct)
+        return sct
+
+    @property
+    def monitors(self):
+        """mss monitor list: index 0 is the combined virtual screen, 1..n are single monitors."""
+        return self._sct().monitors
+
+    def grab(self, monitor_index=1):
+        sct = self._sct()
+        monitor = sct.monitors[monitor_index]
+        started = time.perf_counter()
+        shot = sct.grab(monitor)
+        frame = Frame(shot.raw, shot.size, monitor_index, monitor)
+        metrics.record_timing("capture.grab", time.perf_counter() - started)
+        metrics.increment("capture.grabs")
+        metrics.increment("capture.bytes_allocated", len(shot.raw))
+        return frame
+
+    def grab_all(self):
+        """Captures every physical monitor in parallel. Returns frames in monitor order."""
+        indices = list(range(1, len(self.monitors)))
+        if len(indices) <= 1:
+            return [self.grab(i) for i in indices]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=len(indices), thread_name_prefix="capture")
+            executor = self._executor
+        return list(executor.map(self.grab, indices))
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            for sct in self._handles:
+                try:
+                    sct.close()
+                except Exception:
+                    pass
+            self._handles = []
+        self._local = threading.local()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_capture_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = CaptureEngine()
+    return _engine
+
+def capture_frame(monitor_index=CAPTURE_MONITOR):
+    """Captures one monitor (0 = all monitors as one virtual screen) as a Frame."""
+    return get_capture_engine().grab(monitor_index)
 
 def capture_screen():
     """Captures the screenshot of the first monitor."""
-    with mss.mss() as sct:
-        # Get the first monitor (which is usually the combined one or primary)
-        monitor = sct.monitors[1] # 1 is the primary monitor, 0 is all monitors combined
-        
-        # Grab the data
-        sct_img = sct.grab(monitor)
-        
-        # Convert to PIL Image
-        img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-        return img
+    return capture_frame().to_image()
@@ -0,0 +1,245 @@
+import math
+import threading
+from overlay_ai.utils.config import (
+    AI_PROVIDER, AI_PROVIDERS, CONTEXT_TOKEN_BUDGET, LLAMA_N_CTX, LLAMA_IMAGE_TOKENS
+)
+from overlay_ai.services.keyword_index import tokenize
+from overlay_ai.utils import metrics
+
+# max_tokens every provider call asks for
+RESPONSE_TOKENS = 500
+# Chat template, role markers and the [System OCR]/[Manual Context] headers
+PROMPT_OVERHEAD_TOKENS = 64
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Share of the budget each section may use before leftovers are handed out,
+# and the order leftovers are handed out in.
+SHARES = {"ocr": 0.4, "manual": 0.35, "history": 0.25}
+LEFTOVER_PRIORITY = ("ocr", "manual", "history")
+
+# Retrieved chunks overlap by up to chunk_overlap=200 characters; shorter matches are coincidence
+MIN_CHUNK_OVERLAP = 32
+MAX_CHUNK_OVERLAP = 400
+
+# --- Token counting ---
+
+_tiktoken_encoding = None
+_tiktoken_lock = threading.Lock()
+
+def _approximate_tokens(text):
+    return math.ceil(len(text) / 3.5)
+
+def _openai_tokens(text):
+    global _tiktoken_encoding
+    if _tiktoken_encoding is None:
+        with _tiktoken_lock:
+            if _tiktoken_encoding is None:
+                try:
+                    import tiktoken
+                    _tiktoken_encoding = tiktoken.encoding_for_model("gpt-4o")
+                except Exception:
+                    # tiktoken is optional; remember that it is missing
+                    _tiktoken_encoding = False
+    if not _tiktoken_encoding:
+        return _approximate_tokens(text)
+    return len(_tiktoken_encoding.encode(text, disallowed_special=()))
+
+def _llama_tokens(text):
+    # Imported here: llm_service imports this module
+    from overlay_ai.services import llm_service
+    llama = llm_service.llama_instance
+    if llama is None:
+        return _approximate_tokens(text)
+    return len(llama.tokenize(text.encode("utf-8"), add_bos=False, special=False))
+
+def count_tokens(text, provider=None):
+    """Tokens `text` costs with `provider`'s tokenizer (approximated for Ollama or without one)."""
+    if not text:
+        return 0
+    provider = provider or AI_PROVIDER
+    if provider == "llamacpp":
+        return _llama_tokens(text)
+    if provider == "openai":
+        return _openai_tokens(text)
+    return _approximate_tokens(text)
+
+def truncate_to_tokens(text, max_tokens, provider=None):
+    """Longest prefix of `text` (cut at a line or word end when possible) within `max_tokens`."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, provider) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid], provider) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    cut = text[:low]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    return cut[:boundary] if boundary > len(cut) // 2 else cut
+
+def prompt_budget(provider=None, has_image=False):
+    """
+    Tokens available for the question, OCR text, manual chunks and history.
+    Without a provider, the smallest budget in the failover chain, since any of
+    them may end up answering the same prompt.
+    """
+    provider = provider or limiting_provider(has_image)
+    budget = CONTEXT_TOKEN_BUDGET
+    if provider == "llamacpp":
+        # Everything, including the reply and the image embedding, has to fit in n_ctx
+        available = LLAMA_N_CTX - RESPONSE_TOKENS - PROMPT_OVERHEAD_TOKENS
+        if has_image:
+            available -= LLAMA_IMAGE_TOKENS
+        budget = min(budget, available)
+    return max(budget, 0)
+
+def limiting_provider(has_image=False):
+    """The provider in AI_PROVIDERS with the smallest prompt budget."""
+    return min(AI_PROVIDERS, key=lambda provider: prompt_budget(provider, has_image))
+
+# --- Section packing ---
+
+def _join_overlap(first, second):
+    """`first` + `second` without the text they share, or None if `second` does not continue `first`."""
+    limit = min(len(first), len(second), MAX_CHUNK_OVERLAP)
+    for size in range(limit, MIN_CHUNK_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+def merge_chunks(chunks):
+    """
+    Collapses retrieved chunks that are neighbours in the same document into one passage,
+    so the text the splitter repeated between them is sent once. Keeps rank order.
+    """
+    merged = []
+    for text in chunks:
+        for i, existing in enumerate(merged):
+            if text in existing:
+                break
+            combined = _join_overlap(existing, text) or _join_overlap(text, existing)
+            if combined:
+                merged[i] = combined
+                break
+        else:
+            merged.append(text)
+    if len(merged) < len(chunks):
+        metrics.increment("context.chunks_merged", len(chunks) - len(merged))
+    return merged
+
+def rank_ocr_lines(ocr_text, question):
+    """
+    Distinct non-empty OCR lines as (score, position, line); lines sharing more
+    words with the question score higher.
+    """
+    terms = set(tokenize(question))
+    ranked = []
+    seen = set()
+    for position, line in enumerate(ocr_text.splitlines()):
+        line = line.strip()
+        if not line or line in seen or not any(c.isalnum() for c in line):
+            continue
+        seen.add(line)
+        score = len(terms.intersection(tokenize(line)))
+        ranked.append((score, position, line))
+    return ranked
+
+def _pack_ocr(ocr_text, question, max_tokens, provider):
+    if count_tokens(ocr_text, provider) <= max_tokens:
+        return ocr_text
+    # Best-matching lines first, shown in their on-screen order
+    kept = []
+    used = 0
+    for score, position, line in sorted(rank_ocr_lines(ocr_text, question), key=lambda r: (-r[0], r[1])):
+        cost = count_tokens(line, provider) + 1
+        if used + cost > max_tokens:
+            continue
+        kept.append((position, line))
+        used += cost
+    return "\n".join(line for _, line in sorted(kept))
+
+def _pack_chunks(chunks, max_tokens, provider):
+    kept = []
+    used = 0
+    for text in chunks:
+        cost = count_tokens(text, provider) + 2
+        if used + cost > max_tokens:
+            if not kept:
+                # Better part of the best passage than nothing
+                kept.append(truncate_to_tokens(text, max_tokens - 2, provider))
+            break
+        kept.append(text)
+        used += cost
+    return "\n\n".join(t for t in kept if t)
+
+def message_tokens(message, provider=None):
+    content = message.get("content", "")
+    if not isinstance(content, str):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return count_tokens(content, provider) + MESSAGE_OVERHEAD_TOKENS
+
+def _pack_history(history, max_tokens, provider):
+    # A leading system message is the summary of older turns; keep it ahead of old verbatim turns
+    pinned = []
+    used = 0
+    if history and history[0].get("role") == "system":
+        cost = message_tokens(history[0], provider)
+        if cost <= max_tokens:
+            pinned.append(history[0])
+            used = cost
+        history = history[1:]
+    # Newest turns first; stop at the first one that does not fit so the kept turns stay contiguous
+    kept = []
+    for message in reversed(history):
+        cost = message_tokens(message, provider)
+        if used + cost > max_tokens:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return pinned + kept
+
+def _allocate(needs, total):
+    """Splits `total` tokens by SHARES, then hands what a section does not need to the others."""
+    allocation = {name: min(need, int(total * SHARES[name])) for name, need in needs.items()}
+    leftover = total - sum(allocation.values())
+    for name in LEFTOVER_PRIORITY:
+        extra = min(needs[name] - allocation[name], leftover)
+        if extra > 0:
+            allocation[name] += extra
+            leftover -= extra
+    return allocation
+
+def assemble_context(question, ocr_text="", chunks=None, history=None, provider=None, has_image=False):
+    """
+    Fits the prompt sections into the provider's token budget; without a provider,
+    into that of the tightest provider in the failover chain, counted with its tokenizer.
+    Returns (ocr_text, manual_context, history) ready for query_assistant.
+    """
+    provider = provider or limiting_provider(has_image)
+    chunks = merge_chunks([c for c in (chunks or []) if c])
+    history = list(history or [])
+    ocr_text = ocr_text or ""
+
+    total = prompt_budget(provider, has_image) - count_tokens(question, provider)
+    needs = {
+        "ocr": count_tokens(ocr_text, provider),
+        "manual": sum(count_tokens(c, provider) + 2 for c in chunks),
+        "history": sum(message_tokens(m, provider) for m in history),
+    }
+    allocation = _allocate(needs, max(total, 0))
+
+    packed_ocr = _pack_ocr(ocr_text, question, allocation["ocr"], provider) if ocr_text else ""
+    manual_context = _pack_chunks(chunks, allocation["manual"], provider)
+    packed_history = _pack_history(history, allocation["history"], provider)
+
+    used = (count_tokens(packed_ocr, provider) + count_tokens(manual_context, provider)
+            + sum(message_tokens(m, provider) for m in packed_history))
+    dropped = sum(needs.values()) - used
+    metrics.increment("context.tokens_sent", used)
+    if dropped > 0:
+        metrics.increment("context.tokens_dropped", dropped)
+    return packed_ocr, manual_context, packed_history
@@ -0,0 +1,214 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from overlay_ai.utils.config import CONVERSATION_STORE_PATH, CONVERSATION_PAGE_SIZE
+from overlay_ai.utils import metrics
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    " id TEXT PRIMARY KEY,"
+    " title TEXT NOT NULL,"
+    " created_at REAL NOT NULL,"
+    " updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions(updated_at)",
+    "CREATE TABLE IF NOT EXISTS messages ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " session_id TEXT NOT NULL,"
+    " role TEXT NOT NULL,"
+    " content TEXT NOT NULL,"
+    " created_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS messages_session ON messages(session_id, id)",
+)
+
+# Full-text index kept in sync with `messages` by triggers (external-content FTS5 table)
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+    " content, content='messages', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN"
+    " INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN"
+    " INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN"
+    " INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);"
+    " INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+)
+
+def _fts_query(text):
+    """Quotes each word so user input is matched literally instead of parsed as FTS syntax."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+class ConversationStore:
+    """
+    Chat sessions on disk (SQLite in WAL mode). Writes are queued to a single writer
+    thread, so the UI never waits for the disk and writes keep their order; reads use
+    their own connection, which WAL lets run alongside the writer. Messages are read
+    back a page at a time, newest first, through the (session_id, id) index.
+    """
+
+    def __init__(self, path=CONVERSATION_STORE_PATH, page_size=CONVERSATION_PAGE_SIZE):
+        self.path = path
+        self.page_size = page_size
+        self.fts = True
+        self._read_conn = None
+        self._write_conn = None
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-store")
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL: a crash can lose the last commits, but never corrupts the file
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        try:
+            for statement in FTS_SCHEMA:
+                conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5: search falls back to a table scan
+            print(f"Conversation search index unavailable: {e}")
+            self.fts = False
+        conn.commit()
+        return conn
+
+    def _reader(self):
+        if self._read_conn is None:
+            self._read_conn = self._open()
+        return self._read_conn
+
+    def _submit(self, func, *args):
+        def run():
+            if self._write_conn is None:
+                self._write_conn = self._open()
+            with metrics.timed("conversation_store.write"):
+                result = func(self._write_conn, *args)
+                self._write_conn.commit()
+            return result
+        future = self._writer.submit(run)
+        future.add_done_callback(self._report_failure)
+        return future
+
+    @staticmethod
+    def _report_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Conversation store write failed: {future.exception()}")
+
+    # --- Writes (queued, return futures) ---
+
+    def start_session(self, title=""):
+        """Returns the id of a new session; the row is written in the background."""
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        self._submit(lambda conn: conn.execute(
+            "INSERT INTO sessions (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (session_id, title[:80], now, now)
+        ))
+        return session_id
+
+    def set_title(self, session_id, title):
+        """Names a session that was started without a title; keeps an existing one."""
+        return self._submit(lambda conn: conn.execute(
+            "UPDATE sessions SET title = ? WHERE id = ? AND title = ''", (title[:80], session_id)
+        ))
+
+    def append(self, session_id, role, content):
+        """Queues a message; the returned future resolves to its id (pass it to `update`)."""
+        now = time.time()
+
+        def write(conn):
+            message_id = conn.execute(
+                "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, role, content, now)
+            ).lastrowid
+            conn.execute("UPDATE sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+            return message_id
+        return self._submit(write)
+
+    def update(self, message, content):
+        """Replaces a message's text (e.g. a QA revision). `message` is the future from `append`."""
+        def write(conn):
+            # Runs after the append on the same writer thread, so the id is already known
+            message_id = message.result() if isinstance(message, Future) else message
+            conn.execute("UPDATE messages SET content = ? WHERE id = ?", (content, message_id))
+        return self._submit(write)
+
+    def clear(self):
+        """Deletes every session and message."""
+        def write(conn):
+            conn.execute("DELETE FROM messages")
+            conn.execute("DELETE FROM sessions")
+        return self._submit(write)
+
+    def close(self):
+        """Waits for queued writes to reach the disk."""
+        self._writer.shutdown(wait=True)
+
+    # --- Reads ---
+
+    def last_session(self):
+        """Id of the most recently active session, or None."""
+        with self._lock:
+            row = self._reader().execute("SELECT id FROM sessions ORDER BY updated_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def sessions(self, limit=20):
+        with self._lock:
+            rows = self._reader().execute(
+                "SELECT id, title, created_at, updated_at FROM sessions ORDER BY updated_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [{"id": r[0], "title": r[1], "created_at": r[2], "updated_at": r[3]} for r in rows]
+
+    def page(self, session_id, before_id=None, limit=None):
+        """
+        Up to `limit` messages of a session older than `before_id` (newest page when
+        None), oldest first. Only the page is read, however long the session is.
+        """
+        limit = limit or self.page_size
+        with self._lock, metrics.timed("conversation_store.page"):
+            if before_id is None:
+                rows = self._reader().execute(
+                    "SELECT id, role, content FROM messages WHERE session_id = ?"
+                    " ORDER BY id DESC LIMIT ?",
+                    (session_id, limit)
+                ).fetchall()
+            else:
+                rows = self._reader().execute(
+                    "SELECT id, role, content FROM messages WHERE session_id = ? AND id < ?"
+                    " ORDER BY id DESC LIMIT ?",
+                    (session_id, before_id, limit)
+                ).fetchall()
+        rows.reverse()
+        return [{"id": r[0], "role": r[1], "content": r[2]} for r in rows]
+
+    def search(self, text, limit=20):
+        """Past messages containing every word of `text`, best matches first."""
+        if not text.split():
+            return []
+        with self._lock, metrics.timed("conversation_store.search"):
+            conn = self._reader()
+            if self.fts:
+                rows = conn.execute(
+                    "SELECT m.session_id, m.id, m.role, snippet(messages_fts, 0, '[', ']', '...', 16), m.created_at"
+                    " FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid"
+                    " WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (_fts_query(text), limit)
+                ).fetchall()
+            else:
+                clauses = " AND ".join("content LIKE ?" for _ in text.split())
+                rows = conn.execute(
+                    f"SELECT session_id, id, role, substr(content, 1, 200), created_at FROM messages"
+                    f" WHERE {clauses} ORDER BY id DESC LIMIT ?",
+                    [f"%{word}%" for word in text.split()] + [limit]
+                ).fetchall()
+        return [
+            {"session_id": r[0], "id": r[1], "role": r[2], "snippet": r[3], "created_at": r[4]}
+            for r in rows
+        ]
+
+# Singleton instance
+conversation_store = ConversationStore()
@@ -0,0 +1,128 @@
+import base64
+import threading
+import weakref
+from io import BytesIO
+from PIL import Image
+from overlay_ai.utils.config import AI_PROVIDER, IMAGE_MAX_EDGE, IMAGE_FORMAT, IMAGE_QUALITY
+from overlay_ai.utils import metrics
+
+# Default upload format per provider.
+# Screenshots compress far better lossy than as PNG, and the models do not need lossless input.
+# llama.cpp decodes images with stb_image, which has no WebP support.
+PROVIDER_FORMATS = {
+    "openai": "WEBP",
+    "ollama": "JPEG",
+    "llamacpp": "JPEG",
+}
+
+MIME_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+class EncodedImage:
+    """An image payload ready to be sent to a provider."""
+
+    def __init__(self, data, image_format, size):
+        self.data = data
+        self.format = image_format
+        self.size = size
+        self._base64 = None
+
+    @property
+    def mime_type(self):
+        return MIME_TYPES.get(self.format, "application/octet-stream")
+
+    @property
+    def base64(self):
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode("utf-8")
+        return self._base64
+
+    @property
+    def data_url(self):
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+# id(image) -> {(format, max_edge, quality): EncodedImage}
+# Entries are dropped when the source image is garbage collected,
+# so a payload lives exactly as long as the request that captured it.
+_memo = {}
+_memo_lock = threading.Lock()
+
+def payloads_for(image):
+    """The live memo dict of encoded payloads for `image`."""
+    key = id(image)
+    with _memo_lock:
+        payloads = _memo.get(key)
+        if payloads is None:
+            payloads = {}
+            _memo[key] = payloads
+            weakref.finalize(image, _memo.pop, key, None)
+        return payloads
+
+def share_payloads(image, payloads):
+    """Makes `image` reuse the payloads of an identical earlier image."""
+    key = id(image)
+    with _memo_lock:
+        if key not in _memo:
+            weakref.finalize(image, _memo.pop, key, None)
+        _memo[key] = payloads
+
+def format_for_provider(provider=None):
+    if IMAGE_FORMAT != "AUTO":
+        return IMAGE_FORMAT
+    return PROVIDER_FORMATS.get(provider or AI_PROVIDER, "JPEG")
+
+def downscale(image, max_edge=IMAGE_MAX_EDGE):
+    """Returns `image` resized so its longest edge is at most `max_edge` (0 disables)."""
+    width, height = image.size
+    longest = max(width, height)
+    if not max_edge or longest <= max_edge:
+        return image
+    scale = max_edge / longest
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(new_size, Image.LANCZOS, reducing_gap=3.0)
+
+def _downscaled(image, max_edge):
+    # Capture frames can resize straight from their raw buffer
+    if hasattr(image, "downscaled"):
+        return image.downscaled(max_edge)
+    return downscale(image, max_edge)
+
+def _encode(image, image_format):
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    elif image_format == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+
+    buffered = BytesIO()
+    if image_format == "PNG":
+        image.save(buffered, format="PNG", compress_level=1)
+    else:
+        image.save(buffered, format=image_format, quality=IMAGE_QUALITY)
+    return buffered.getvalue()
+
+def encode_for_provider(image, provider=None):
+    """
+    Downscales and encodes `image` in the format `provider` prefers.
+    The result is memoized per image object, so the draft, QA retry and any
+    other call in the same request share one encode.
+    """
+    image_format = format_for_provider(provider)
+    key = (image_format, IMAGE_MAX_EDGE, IMAGE_QUALITY)
+    payloads = payloads_for(image)
+
+    cached = payloads.get(key)
+    if cached is not None:
+        metrics.increment("encode.memo_hits")
+        return cached
+
+    with metrics.timed("encode.image"):
+        resized = _downscaled(image, IMAGE_MAX_EDGE)
+        data = _encode(resized, image_format)
+    metrics.increment("encode.bytes", len(data))
+
+    encoded = EncodedImage(data, image_format, resized.size)
+    payloads[key] = encoded
+    return encoded
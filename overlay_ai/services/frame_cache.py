@@ -0,0 +1,63 @@
+import itertools
+from overlay_ai.utils.config import FRAME_CACHE_SIZE, FRAME_CACHE_TOLERANCE, FRAME_CACHE_MAX_CHANGED
+from overlay_ai.utils.imagehash import grid_signature, changed_fraction, pixel_digest
+from overlay_ai.utils.lru import LRUCache
+from overlay_ai.utils import metrics
+
+class FrameCacheEntry:
+    def __init__(self, signature, ocr_text, payloads):
+        # (pixel digest, grid signature or None), as returned by FrameCache.lookup
+        self.digest, self.grid = signature
+        self.ocr_text = ocr_text
+        # Shared dict of encoded image payloads (see encoding_service.payloads_for)
+        self.payloads = payloads
+
+class FrameCache:
+    """
+    Remembers OCR text and encoded payloads for recently seen screens.
+    A frame with exactly the same pixels as a cached one reuses both instead of
+    running Tesseract and the encoder again. With `max_changed` > 0 a frame whose
+    downsampled grid differs in at most that fraction of cells also counts; that
+    is opt-in because small but meaningful changes (a tooltip, a digit) can fall
+    under any threshold and the model would then see the previous screen.
+    """
+
+    def __init__(self, max_entries=FRAME_CACHE_SIZE, tolerance=FRAME_CACHE_TOLERANCE, max_changed=FRAME_CACHE_MAX_CHANGED):
+        self.tolerance = tolerance
+        self.max_changed = max_changed
+        self._entries = LRUCache(max_entries)
+        self._ids = itertools.count()
+
+    @property
+    def enabled(self):
+        return self._entries.max_entries > 0
+
+    def lookup(self, image):
+        """Returns (signature, entry). `entry` is None on a miss."""
+        with metrics.timed("frame_cache.signature"):
+            digest = pixel_digest(image)
+            grid = grid_signature(image) if self.max_changed > 0 else None
+        for key, entry in self._entries.items():
+            if entry.digest == digest:
+                self._entries.touch(key)
+                metrics.increment("frame_cache.hits")
+                return (digest, grid), entry
+        if grid is not None:
+            for key, entry in self._entries.items():
+                if entry.grid is not None and changed_fraction(grid, entry.grid, self.tolerance) <= self.max_changed:
+                    self._entries.touch(key)
+                    metrics.increment("frame_cache.near_hits")
+                    return (digest, grid), entry
+        metrics.increment("frame_cache.misses")
+        return (digest, grid), None
+
+    def store(self, signature, ocr_text, payloads):
+        entry = FrameCacheEntry(signature, ocr_text, payloads)
+        self._entries.put(next(self._ids), entry)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+# Singleton instance
+frame_cache = FrameCache()
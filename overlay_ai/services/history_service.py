@@ -0,0 +1,156 @@
+import threading
+from overlay_ai.utils.config import AI_PROVIDER, HISTORY_TOKEN_BUDGET, HISTORY_SUMMARY_TOKENS
+from overlay_ai.services.context_service import count_tokens, message_tokens, truncate_to_tokens
+from overlay_ai.services.llm_service import LOCAL_PROVIDERS, query_assistant_raw, is_error_response, wait_for_idle
+from overlay_ai.utils import metrics
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+class ConversationHistory:
+    """
+    Chat history for prompts: recent turns verbatim within HISTORY_TOKEN_BUDGET,
+    older turns folded into a running summary on a background thread (held back
+    while a local model is answering the user).
+
+    Entries are the {"role", "content"} dicts returned by `append`; editing one in
+    place (e.g. a background QA revision) is picked up by the next `messages()`.
+    """
+
+    def __init__(self, budget=HISTORY_TOKEN_BUDGET, summary_tokens=HISTORY_SUMMARY_TOKENS):
+        self.budget = budget
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self._turns = []  # Verbatim entries not yet folded into the summary
+        self._lock = threading.Lock()
+        self._compacting = False
+        # Bumped by clear() so a summary finished afterwards is discarded
+        self._generation = 0
+
+    def append(self, role, content):
+        entry = {"role": role, "content": content}
+        with self._lock:
+            self._turns.append(entry)
+        self._maybe_compact()
+        return entry
+
+    def messages(self):
+        """The summary block (if any) followed by the newest turns that fit the budget."""
+        with self._lock:
+            turns = list(self._turns)
+            summary = self.summary
+        kept = []
+        used = 0
+        for entry in reversed(turns):
+            cost = message_tokens(entry)
+            if used + cost > self.budget:
+                break
+            kept.append(dict(entry))
+            used += cost
+        kept.reverse()
+        if summary:
+            kept.insert(0, {"role": "system", "content": SUMMARY_PREFIX + summary})
+        return kept
+
+    def restore(self, turns):
+        """
+        Replaces the history with saved turns (oldest first), keeping only the newest
+        that fit the budget. Nothing is summarized, so reopening a session is free.
+        Returns the kept entries.
+        """
+        kept = []
+        used = 0
+        for role, content in reversed(turns):
+            entry = {"role": role, "content": content}
+            cost = message_tokens(entry)
+            if used + cost > self.budget:
+                break
+            kept.append(entry)
+            used += cost
+        kept.reverse()
+        with self._lock:
+            self._turns = kept
+            self.summary = ""
+            self._generation += 1
+        return kept
+
+    def clear(self):
+        with self._lock:
+            self._turns = []
+            self.summary = ""
+            self._generation += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._turns)
+
+    def _maybe_compact(self):
+        """Starts a summary of the oldest turns once the verbatim turns exceed the budget."""
+        with self._lock:
+            total = sum(message_tokens(entry) for entry in self._turns)
+            if total <= self.budget or self._compacting:
+                return
+            # Fold turns until only about half the budget stays verbatim, so this runs
+            # every few turns instead of on every one.
+            folded = []
+            for entry in self._turns:
+                if total <= self.budget // 2:
+                    break
+                folded.append(entry)
+                total -= message_tokens(entry)
+            if not folded:
+                return
+            if self.summary_tokens <= 0:
+                # Summaries disabled: older turns are simply dropped
+                del self._turns[:len(folded)]
+                return
+            self._compacting = True
+            generation = self._generation
+            previous = self.summary
+
+        thread = threading.Thread(
+            target=self._compact, args=(previous, folded, generation),
+            name="history-summary", daemon=True
+        )
+        thread.start()
+
+    def _compact(self, previous, folded, generation):
+        if AI_PROVIDER in LOCAL_PROVIDERS and not wait_for_idle(timeout=0):
+            # A local model generates one answer at a time; summarize once the user's
+            # question (and its QA pass) is done instead of making it wait for us
+            metrics.increment("history.summary_deferred")
+            wait_for_idle()
+        try:
+            with metrics.timed("history.summarize"):
+                summary = self._summarize(previous, folded)
+        except Exception as e:
+            print(f"History summary failed: {e}")
+            summary = None
+
+        with self._lock:
+            self._compacting = False
+            if generation != self._generation or summary is None:
+                return
+            # Folded turns are still at the front: only append() adds turns, at the end
+            del self._turns[:len(folded)]
+            self.summary = summary
+        metrics.increment("history.turns_summarized", len(folded))
+        # Turns may have piled up while summarizing
+        self._maybe_compact()
+
+    def _summarize(self, previous, folded):
+        transcript = "\n".join(f"{entry['role'].capitalize()}: {entry['content']}" for entry in folded)
+        prompt = (
+            "Update the running summary of a conversation between a user and a screen assistant.\n"
+            "Keep facts, names, numbers, decisions and open questions; drop pleasantries.\n"
+            f"Reply with the summary only, in at most {self.summary_tokens} tokens.\n\n"
+            f"Current summary:\n{previous or '(none)'}\n\n"
+            f"New turns:\n{transcript}"
+        )
+        summary = query_assistant_raw(prompt, image=None, history=None)
+        if is_error_response(summary):
+            print(f"History summary failed: {summary}")
+            return None
+        summary = summary.strip()
+        if count_tokens(summary) > self.summary_tokens:
+            summary = truncate_to_tokens(summary, self.summary_tokens)
+        return summary
@@ -0,0 +1,115 @@
+import json
+import math
+import os
+import re
+import threading
+from overlay_ai.utils.files import atomic_write
+
+# Words, numbers and compound identifiers such as E-1023, 0x80070005, PN/4471-B or File.Save
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+SPLIT_RE = re.compile(r"[-_./:]")
+
+def tokenize(text):
+    """Lower-cased tokens. Compound identifiers are kept whole and also split into their parts."""
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if SPLIT_RE.search(token):
+            tokens.extend(part for part in SPLIT_RE.split(token) if part)
+    return tokens
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Merges ranked ID lists; each list contributes 1 / (k + rank) per ID."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class KeywordIndex:
+    """
+    Inverted index with BM25 scoring, kept next to the vector store.
+    Exact identifiers (error codes, part numbers, menu names) that embeddings blur are found here,
+    and it answers without an embedding round-trip.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self):
+        self.postings = {}  # term -> {doc_id: term frequency}
+        self.doc_lengths = {}  # doc_id -> token count
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text):
+        tokens = tokenize(text)
+        with self._lock:
+            if doc_id in self.doc_lengths:
+                return
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                self.postings.setdefault(token, {})[doc_id] = count
+            self.doc_lengths[doc_id] = len(tokens)
+            self.total_length += len(tokens)
+
+    def remove(self, doc_id, text):
+        with self._lock:
+            length = self.doc_lengths.pop(doc_id, None)
+            if length is None:
+                return
+            self.total_length -= length
+            for token in set(tokenize(text)):
+                docs = self.postings.get(token)
+                if docs is not None:
+                    docs.pop(doc_id, None)
+                    if not docs:
+                        del self.postings[token]
+
+    def search(self, query, k=10):
+        """Returns [(doc_id, score)] best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self.doc_lengths)
+            if not count or not terms:
+                return []
+            average = self.total_length / count
+            scores = {}
+            for term in terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = tf + self.K1 * (1 - self.B + self.B * self.doc_lengths[doc_id] / average)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def clear(self):
+        with self._lock:
+            self.postings = {}
+            self.doc_lengths = {}
+            self.total_length = 0
+
+    def save(self, path):
+        with self._lock:
+            data = {"postings": self.postings, "doc_lengths": self.doc_lengths}
+        with atomic_write(path) as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            index.postings = data["postings"]
+            index.doc_lengths = data["doc_lengths"]
+            index.total_length = sum(index.doc_lengths.values())
+        return index
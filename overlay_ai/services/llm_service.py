@@ -1,67 +1,258 @@
-import base64
-from io import BytesIO
-from openai import OpenAI
-import ollama
-from overlay_ai.utils.config import OPENAI_API_KEY, AI_PROVIDER, OLLAMA_MODEL, LLAMA_MODEL_PATH, LLAMA_CLIP_PATH, LLAMA_N_GPU_LAYERS
+import os
+import threading
+import time
+from contextlib import contextmanager
+from overlay_ai.utils.config import OPENAI_API_KEY, AI_PROVIDER, OLLAMA_MODEL, OLLAMA_BASE_URL, OLLAMA_TIMEOUT, OLLAMA_CONNECT_TIMEOUT, OLLAMA_KEEP_ALIVE, CAPTION_CONCURRENCY, LLAMA_MODEL_PATH, LLAMA_CLIP_PATH, LLAMA_N_GPU_LAYERS, LLAMA_N_CTX, VERIFY_MODE, RESPONSE_CACHE, LLM_TIMEOUT
+from overlay_ai.services.encoding_service import encode_for_provider
+from overlay_ai.services.context_service import (
+    RESPONSE_TOKENS, assemble_context, count_tokens, prompt_budget, truncate_to_tokens
+)
+from overlay_ai.utils.cancellation import RequestCancelled
+from overlay_ai.services import provider_chain
+from overlay_ai.services.provider_chain import ProviderError
+from overlay_ai.utils import metrics
 
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# Provider SDKs are imported and clients built on first use, not at import time,
+# so importing this module stays cheap for the UI.
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None and OPENAI_API_KEY:
+        with _openai_client_lock:
+            if _openai_client is None:
+                with metrics.timed("startup.openai_client"):
+                    from openai import OpenAI
+                    _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
+
+_ollama_client = None
+_ollama_client_lock = threading.Lock()
+
+def get_ollama_client():
+    """
+    One Ollama client for the whole app, so every question and caption reuses the
+    same pooled HTTP connections to OLLAMA_BASE_URL.
+    """
+    global _ollama_client
+    if _ollama_client is None:
+        with _ollama_client_lock:
+            if _ollama_client is None:
+                with metrics.timed("startup.ollama_client"):
+                    import httpx
+                    import ollama
+                    _ollama_client = ollama.Client(
+                        host=OLLAMA_BASE_URL,
+                        timeout=httpx.Timeout(OLLAMA_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+                        # Captions run CAPTION_CONCURRENCY requests at once next to a chat question
+                        limits=httpx.Limits(max_connections=CAPTION_CONCURRENCY + 2, max_keepalive_connections=CAPTION_CONCURRENCY + 2),
+                    )
+    return _ollama_client
+
+def _ollama_keep_alive():
+    # Ollama takes a duration string ('30m') or seconds (-1 keeps the model loaded forever)
+    try:
+        return int(OLLAMA_KEEP_ALIVE)
+    except ValueError:
+        return OLLAMA_KEEP_ALIVE
+
+def warm_ollama():
+    """Loads OLLAMA_MODEL into memory (an empty prompt generates nothing) and pins it for OLLAMA_KEEP_ALIVE."""
+    started = time.perf_counter()
+    get_ollama_client().generate(model=OLLAMA_MODEL, prompt="", keep_alive=_ollama_keep_alive())
+    metrics.record_timing("startup.ollama_model_load", time.perf_counter() - started)
+
+# Prefixes of the error strings the provider functions return instead of raising
+ERROR_PREFIXES = ("Error:", "OpenAI Error:", "Ollama Error:", "Llama Error:")
+
+def is_error_response(text):
+    return not text or text.startswith(ERROR_PREFIXES)
+
+def current_model_id(provider=None):
+    """Identifies the provider and model answering right now, e.g. 'ollama:llava'."""
+    provider = provider or AI_PROVIDER
+    if provider == "ollama":
+        return f"ollama:{OLLAMA_MODEL}"
+    if provider == "llamacpp":
+        return f"llamacpp:{os.path.basename(LLAMA_MODEL_PATH)}"
+    return "openai:gpt-4o"
+
+def _answer_context(context_chunks, history):
+    """Fingerprint of what an answer depends on besides the question: chunks and prior turns."""
+    from overlay_ai.services.response_cache import context_fingerprint
+    turns = [f"{m.get('role')}: {m.get('content')}" for m in (history or [])]
+    # Turns are prefixed so a chunk can never collide with a turn of the same text
+    return context_fingerprint(list(context_chunks) + ["\0history"] + turns)
+
+def cached_answer(question, context_chunks, question_vector=None, history=None):
+    """
+    A stored answer to `question` asked against the same retrieved chunks and the
+    same conversation so far with the current model, or None. A follow-up like
+    "why?" thus never gets an answer from another conversation.
+    Only meant for questions without a screenshot.
+    """
+    if not RESPONSE_CACHE:
+        return None
+    from overlay_ai.services.response_cache import response_cache
+    return response_cache.get(question, current_model_id(), _answer_context(context_chunks, history), question_vector)
+
+def cache_answer(question, context_chunks, answer, question_vector=None, provider=None, history=None):
+    """Stores an answer under the model of `provider`, the one that actually wrote it."""
+    if not RESPONSE_CACHE or is_error_response(answer):
+        return
+    from overlay_ai.services.response_cache import response_cache
+    response_cache.put(question, current_model_id(provider), _answer_context(context_chunks, history), answer, question_vector)
 
 def encode_image(pil_image):
-    buffered = BytesIO()
-    pil_image.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+    return encode_for_provider(pil_image).base64
 
 def image_to_bytes(pil_image):
-    buffered = BytesIO()
-    pil_image.save(buffered, format="PNG")
-    return buffered.getvalue()
+    return encode_for_provider(pil_image).data
+
+def _consume_stream(stream, extract, on_chunk):
+    """
+    Forwards the non-empty text `extract(event)` of each stream event to `on_chunk`
+    and returns the joined text. `on_chunk` may raise RequestCancelled to abandon the
+    answer; the stream is closed either way so the provider stops generating.
+    """
+    parts = []
+    try:
+        for event in stream:
+            piece = extract(event)
+            if piece:
+                parts.append(piece)
+                on_chunk(piece)
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    return "".join(parts)
 
 llama_instance = None
+_llama_load_lock = threading.Lock()
+# Llama objects are not safe for concurrent generation (preload warm-up vs. a worker)
+_llama_generate_lock = threading.Lock()
+
+# Providers that answer one prompt at a time on this machine, so background calls
+# (history summaries) would make the user's next question queue behind them
+LOCAL_PROVIDERS = ("llamacpp", "ollama")
+
+# Number of user questions being answered (including their QA pass)
+_requests_in_flight = 0
+_requests_idle = threading.Condition()
+
+@contextmanager
+def user_request():
+    """Marks a user's question as in flight for as long as the block runs."""
+    global _requests_in_flight
+    with _requests_idle:
+        _requests_in_flight += 1
+    try:
+        yield
+    finally:
+        with _requests_idle:
+            _requests_in_flight -= 1
+            if not _requests_in_flight:
+                _requests_idle.notify_all()
+
+def wait_for_idle(timeout=None):
+    """Blocks until no user question is in flight. Returns False if `timeout` ran out first."""
+    with _requests_idle:
+        return _requests_idle.wait_for(lambda: not _requests_in_flight, timeout)
 
 def init_llama():
     global llama_instance
     if llama_instance: return
     
-    try:
-        from llama_cpp import Llama
-        from llama_cpp.llama_chat_format import Llava15ChatHandler
-    except ImportError:
-        print("Error: llama-cpp-python not installed. Run `pip install llama-cpp-python`.")
-        return
+    with _llama_load_lock:
+        # Another thread may have finished loading while we waited
+        if llama_instance: return
 
-    print("Loading Llama.cpp model... (This may take a moment)")
-    
-    chat_handler = None
-    if LLAMA_CLIP_PATH:
-        chat_handler = Llava15ChatHandler(clip_model_path=LLAMA_CLIP_PATH)
-    
-    llama_instance = Llama(
-        model_path=LLAMA_MODEL_PATH,
-        chat_handler=chat_handler,
-        n_gpu_layers=LLAMA_N_GPU_LAYERS,
-        n_ctx=2048, # Adjust context window as needed
-        verbose=True
-    )
+        try:
+            from llama_cpp import Llama
+            from llama_cpp.llama_chat_format import Llava15ChatHandler
+        except ImportError:
+            print("Error: llama-cpp-python not installed. Run `pip install llama-cpp-python`.")
+            return
+
+        print("Loading Llama.cpp model... (This may take a moment)")
+        started = time.perf_counter()
+        
+        try:
+            chat_handler = None
+            if LLAMA_CLIP_PATH:
+                chat_handler = Llava15ChatHandler(clip_model_path=LLAMA_CLIP_PATH)
+            
+            llama_instance = Llama(
+                model_path=LLAMA_MODEL_PATH,
+                chat_handler=chat_handler,
+                n_gpu_layers=LLAMA_N_GPU_LAYERS,
+                n_ctx=LLAMA_N_CTX,
+                verbose=True
+            )
+        except Exception as e:
+            print(f"Error loading Llama.cpp model: {e}")
+            return
+        metrics.record_timing("startup.llama_load", time.perf_counter() - started)
+
+def preload_llama(on_ready=None):
+    """
+    Loads the llama.cpp model on a background thread and runs a tiny warm-up generation.
+    `on_ready(ok)` is called from that thread once the model is usable (or failed to load).
+    """
+    def _run():
+        started = time.perf_counter()
+        init_llama()
+        ok = llama_instance is not None
+        if ok:
+            warmup_started = time.perf_counter()
+            try:
+                with _llama_generate_lock:
+                    llama_instance.create_chat_completion(
+                        messages=[{"role": "user", "content": "Hi"}],
+                        max_tokens=1
+                    )
+                metrics.record_timing("startup.llama_warmup", time.perf_counter() - warmup_started)
+            except Exception as e:
+                print(f"Llama warm-up failed: {e}")
+            elapsed = time.perf_counter() - started
+            metrics.record_timing("startup.llama_ready", elapsed)
+            print(f"Llama.cpp model ready in {elapsed:.1f}s")
+        if on_ready:
+            on_ready(ok)
+
+    thread = threading.Thread(target=_run, name="llama-preload", daemon=True)
+    thread.start()
+    return thread
 
 def verify_response_quality(user_text, response_text, image=None, ocr_text="", manual_context="", history=None):
     """
     Uses the AI to critique the response. 
     Returns (is_valid: bool, critique: str)
     """
-    verification_prompt = (
-        f"You are a Quality Assurance AI. \n"
-        f"User asked: '{user_text}'\n"
-        f"Assistant Answered: '{response_text}'\n"
-        f"Context provided: OCR='{ocr_text[:100]}...', Manual='{manual_context[:100]}...'\n\n"
-        f"Task: Evaluate the Assistant's answer.\n"
-        f"1. Is it relevant to the user's question?\n"
-        f"2. Is it coherent (not garbage)?\n"
-        f"3. If Image/OCR was involved, does it seem grounded?\n\n"
-        f"Reply strictly in this format:\n"
-        f"PASS\n"
-        f"(or)\n"
-        f"FAIL: <Short Reason>"
-    )
+    def build(question, answer):
+        return (
+            f"You are a Quality Assurance AI. \n"
+            f"User asked: '{question}'\n"
+            f"Assistant Answered: '{answer}'\n"
+            f"Context provided: OCR='{ocr_text[:100]}...', Manual='{manual_context[:100]}...'\n\n"
+            f"Task: Evaluate the Assistant's answer.\n"
+            f"1. Is it relevant to the user's question?\n"
+            f"2. Is it coherent (not garbage)?\n"
+            f"3. If Image/OCR was involved, does it seem grounded?\n\n"
+            f"Reply strictly in this format:\n"
+            f"PASS\n"
+            f"(or)\n"
+            f"FAIL: <Short Reason>"
+        )
+
+    # The critique gets the same prompt budget as an answer: shorten a long question
+    # and draft (question first, the answer is what is being judged) until it fits
+    spare = prompt_budget() - count_tokens(build("", ""))
+    answer = truncate_to_tokens(response_text, max(spare - min(count_tokens(user_text), spare // 2), 0))
+    question = truncate_to_tokens(user_text, max(spare - count_tokens(answer), 0))
+    verification_prompt = build(question, answer)
     
     # We use the same provider for verification to keep it simple
     # We strip image for verification to save bandwidth/speed, unless critical?
@@ -75,50 +266,106 @@ def verify_response_quality(user_text, response_text, image=None, ocr_text="", m
     else:
         return False, critique
 
-def query_assistant_raw(prompt, image=None, ocr_text="", manual_context="", history=None):
+def query_assistant_raw(prompt, image=None, ocr_text="", manual_context="", history=None, on_chunk=None, on_provider=None):
     """
-    Helper to call the current provider directly without recursion/loops of verification.
+    Helper to call the providers directly without recursion/loops of verification.
+    AI_PROVIDER is asked first; AI_FALLBACK_PROVIDERS take over when it fails or,
+    with HEDGE_DELAY, when it is slow. Returns the error text if all of them fail.
+    `on_provider(name)` is told which provider answered.
     """
-    if AI_PROVIDER == "ollama":
-        return query_ollama(prompt, image, ocr_text, manual_context, history)
-    elif AI_PROVIDER == "llamacpp":
-        return query_llamacpp(prompt, image, ocr_text, manual_context, history)
-    else:
-        return query_openai(prompt, image, ocr_text, manual_context, history)
+    def _ask(provider, on_chunk):
+        if provider == "ollama":
+            response = query_ollama(prompt, image, ocr_text, manual_context, history, on_chunk)
+        elif provider == "llamacpp":
+            response = query_llamacpp(prompt, image, ocr_text, manual_context, history, on_chunk)
+        else:
+            response = query_openai(prompt, image, ocr_text, manual_context, history, on_chunk)
+        if is_error_response(response):
+            raise ProviderError(response or f"Error: {provider} returned an empty answer.")
+        return response
+
+    try:
+        return provider_chain.call(_ask, on_chunk, on_provider)
+    except ProviderError as e:
+        message = str(e)
+        # Keep it recognisable to is_error_response even if it came from a raw exception
+        return message if is_error_response(message) else f"Error: {message}"
 
-def query_assistant(user_text, image=None, ocr_text="", manual_context="", history=None):
+def revise_if_rejected(user_text, draft_response, image=None, ocr_text="", manual_context="", history=None, on_provider=None):
     """
-    Main dispatcher with Verification Loop.
+    Runs QA on a draft answer.
+    Returns the regenerated answer if QA rejects the draft, otherwise None.
+    The draft is kept (None) when the QA call or the retry itself fails.
+    `on_provider` is told which provider wrote the regenerated answer.
     """
-    # 1. Generate Draft
-    draft_response = query_assistant_raw(user_text, image, ocr_text, manual_context, history)
-    
-    # 2. Verify
     is_valid, reason = verify_response_quality(user_text, draft_response, image, ocr_text, manual_context, history)
-    
+
+    if not is_valid and is_error_response(reason):
+        # The critic could not be reached; that says nothing about the draft
+        metrics.increment("verify.unavailable")
+        print(f"Verification skipped: {reason}")
+        return None
+
     if is_valid:
+        metrics.increment("verify.passed")
+        return None
+
+    metrics.increment("verify.failed")
+    print(f"Verification Failed: {reason}. Retrying...")
+    # Retry (Once)
+    retry_prompt = (
+        f"Your previous answer was rejected by QA.\n"
+        f"User Question: {user_text}\n"
+        f"Rejected Answer: {draft_response}\n"
+        f"QA Reason: {reason}\n\n"
+        f"Please allow me to try again. Provide a better, accurate answer."
+    )
+    
+    # We append this to history temporarily for the retry? Or just send as prompt?
+    # Sending as new prompt is cleaner for one-shot retry.
+    # The sections were packed around the short question; repack them around the
+    # retry prompt, which also carries the rejected draft, so it still fits.
+    ocr_text, manual_context, history = assemble_context(
+        retry_prompt, ocr_text, [manual_context] if manual_context else [], history,
+        has_image=image is not None
+    )
+    retry_response = query_assistant_raw(retry_prompt, image, ocr_text, manual_context, history, on_provider=on_provider)
+    if is_error_response(retry_response):
+        # Better the flagged draft than an error in its place
+        metrics.increment("verify.retry_failed")
+        print(f"Verification retry failed: {retry_response}")
+        return None
+
+    # We could verify again, but let's avoid infinite loops. Return the retry.
+    return f"{retry_response}\n\n[Note: Initial response was flagged by Quality Agent and regenerated.]"
+
+def query_assistant(user_text, image=None, ocr_text="", manual_context="", history=None, on_chunk=None, verify_mode=None):
+    """
+    Main dispatcher with Verification Loop.
+    If `on_chunk` is given, the draft is streamed to it piece by piece.
+    `verify_mode` overrides VERIFY_MODE. A caller that gets a plain return value
+    cannot swap the answer later, so 'background' behaves like 'blocking' here;
+    AIWorker implements the real background mode with revise_if_rejected.
+    """
+    mode = verify_mode or VERIFY_MODE
+    if mode == "background":
+        mode = "blocking"
+    started = time.perf_counter()
+
+    # 1. Generate Draft
+    draft_response = query_assistant_raw(user_text, image, ocr_text, manual_context, history, on_chunk=on_chunk)
+    if mode == "off":
+        metrics.record_timing("verify.off.latency", time.perf_counter() - started)
         return draft_response
-    else:
-        print(f"Verification Failed: {reason}. Retrying...")
-        # 3. Retry (Once)
-        retry_prompt = (
-            f"Your previous answer was rejected by QA.\n"
-            f"User Question: {user_text}\n"
-            f"Rejected Answer: {draft_response}\n"
-            f"QA Reason: {reason}\n\n"
-            f"Please allow me to try again. Provide a better, accurate answer."
-        )
-        
-        # We append this to history temporarily for the retry? Or just send as prompt?
-        # Sending as new prompt is cleaner for one-shot retry.
-        retry_response = query_assistant_raw(retry_prompt, image, ocr_text, manual_context, history)
-        
-        # We could verify again, but let's avoid infinite loops. Return the retry.
-        return f"{retry_response}\n\n[Note: Initial response was flagged by Quality Agent and regenerated.]"
+    
+    # 2. Verify (and retry once if rejected)
+    revised = revise_if_rejected(user_text, draft_response, image, ocr_text, manual_context, history)
+    metrics.record_timing("verify.blocking.latency", time.perf_counter() - started)
+    return revised or draft_response
 
 # ... (query_openai remains same) ...
 
-def query_llamacpp(user_text, image=None, ocr_text="", manual_context="", history=None):
+def query_llamacpp(user_text, image=None, ocr_text="", manual_context="", history=None, on_chunk=None):
     init_llama()
     if not llama_instance:
         return "Error: Llama model failed to load. Check console/logs."
@@ -141,23 +388,35 @@ def query_llamacpp(user_text, image=None, ocr_text="", manual_context="", histor
     # {"role": "user", "content": [ {"type": "text", "text": "..."}, {"type": "image_url", "image_url": "data:image/jpeg;base64,..."} ]}
     if image:
         # We need to restructure the last message for multimodal
-        base64_img = encode_image(image)
+        encoded = encode_for_provider(image, "llamacpp")
         content_list = [
             {"type": "text", "text": full_prompt},
-            {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{base64_img}"}}
+            {"type": "image_url", "image_url": {"url": encoded.data_url}}
         ]
         messages[-1]["content"] = content_list
 
     try:
-        response = llama_instance.create_chat_completion(
-            messages=messages,
-            max_tokens=500
-        )
-        return response['choices'][0]['message']['content']
+        with _llama_generate_lock:
+            if on_chunk:
+                stream = llama_instance.create_chat_completion(
+                    messages=messages,
+                    max_tokens=RESPONSE_TOKENS,
+                    stream=True
+                )
+                return _consume_stream(stream, lambda c: c['choices'][0]['delta'].get('content'), on_chunk)
+
+            response = llama_instance.create_chat_completion(
+                messages=messages,
+                max_tokens=RESPONSE_TOKENS
+            )
+            return response['choices'][0]['message']['content']
+    except RequestCancelled:
+        raise
     except Exception as e:
         return f"Llama Error: {e}"
 
-def query_openai(user_text, image=None, ocr_text="", manual_context="", history=None):
+def query_openai(user_text, image=None, ocr_text="", manual_context="", history=None, on_chunk=None):
+    client = get_openai_client()
     if not client:
         return "Error: OpenAI API Key not configured."
 
@@ -181,25 +440,38 @@ def query_openai(user_text, image=None, ocr_text="", manual_context="", history=
     if manual_context:
         user_content.append({"type": "text", "text": f"\n[Manual Context]:\n{manual_context}"})
     if image:
-        base64_image = encode_image(image)
+        encoded = encode_for_provider(image, "openai")
         user_content.append({
             "type": "image_url",
-            "image_url": {"url": f"data:image/png;base64,{base64_image}"}
+            "image_url": {"url": encoded.data_url}
         })
 
     messages.append({"role": "user", "content": user_content})
 
     try:
+        if on_chunk:
+            stream = client.chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                max_tokens=RESPONSE_TOKENS,
+                stream=True,
+                timeout=LLM_TIMEOUT
+            )
+            return _consume_stream(stream, lambda e: e.choices[0].delta.content if e.choices else None, on_chunk)
+
         response = client.chat.completions.create(
             model="gpt-4o",
             messages=messages,
-            max_tokens=500
+            max_tokens=RESPONSE_TOKENS,
+            timeout=LLM_TIMEOUT
         )
         return response.choices[0].message.content
+    except RequestCancelled:
+        raise
     except Exception as e:
         return f"OpenAI Error: {e}"
 
-def query_ollama(user_text, image=None, ocr_text="", manual_context="", history=None):
+def query_ollama(user_text, image=None, ocr_text="", manual_context="", history=None, on_chunk=None):
     # Construct Plain Text Prompt
     full_prompt = f"{user_text}"
     if ocr_text:
@@ -218,12 +490,20 @@ def query_ollama(user_text, image=None, ocr_text="", manual_context="", history=
     
     # Handle Image
     if image:
-        img_bytes = image_to_bytes(image)
+        encoded = encode_for_provider(image, "ollama")
         # Ollama python lib expects 'images' field in the message dict
-        messages[-1]["images"] = [img_bytes]
+        messages[-1]["images"] = [encoded.data]
 
     try:
-        response = ollama.chat(model=OLLAMA_MODEL, messages=messages)
+        client = get_ollama_client()
+        # keep_alive on every request so the model is never unloaded between questions
+        if on_chunk:
+            stream = client.chat(model=OLLAMA_MODEL, messages=messages, stream=True, keep_alive=_ollama_keep_alive())
+            return _consume_stream(stream, lambda c: c['message']['content'], on_chunk)
+
+        response = client.chat(model=OLLAMA_MODEL, messages=messages, keep_alive=_ollama_keep_alive())
         return response['message']['content']
+    except RequestCancelled:
+        raise
     except Exception as e:
         return f"Ollama Error: {e}. Ensure Ollama is running (`ollama serve`)."
@@ -1,5 +1,16 @@
+import hashlib
+import queue
+import threading
+from contextlib import contextmanager
 import pytesseract
-from overlay_ai.utils.config import TESSERACT_CMD
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from overlay_ai.utils.config import (
+    TESSERACT_CMD, TESSDATA_PATH, OCR_BACKEND, OCR_LANG,
+    OCR_MODE, OCR_TILE_SIZE, OCR_TILE_OVERLAP, OCR_WORKERS
+)
+from overlay_ai.utils import metrics
 import os
 
 # Set tesseract command path
@@ -9,13 +20,448 @@ else:
     # If not found, hope it's in PATH, or warn
     pass
 
+# Tiles are OCR'd in parallel, so stop each tesseract instance from also spawning OpenMP threads.
+# Must be set before libtesseract is loaded.
+if OCR_MODE != "full":
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# Tiles whose colour range is below this cannot contain text
+BLANK_TILE_RANGE = 8
+
+# --- Backends ---
+# Every backend reads a 2-D uint8 grayscale array and never touches the disk itself.
+
+class OcrBackend:
+    name = "base"
+
+    def read_text(self, gray):
+        raise NotImplementedError
+
+    def read_words(self, gray):
+        """
+        Returns [(left, top, width, height, text, line)] in array coordinates, in
+        Tesseract's reading order. `line` is a (block, paragraph, line) id tuple.
+        """
+        raise NotImplementedError
+
+    def warm(self, count):
+        """Prepares what `count` concurrent calls need, so the first screen question does not."""
+
+    def close(self):
+        pass
+
+class PytesseractBackend(OcrBackend):
+    """Fallback: pytesseract writes a temp image and spawns `tesseract` per call."""
+    name = "pytesseract"
+
+    def read_text(self, gray):
+        return pytesseract.image_to_string(Image.fromarray(gray), lang=OCR_LANG)
+
+    def read_words(self, gray):
+        data = pytesseract.image_to_data(Image.fromarray(gray), lang=OCR_LANG, output_type=pytesseract.Output.DICT)
+        words = []
+        for i, text in enumerate(data["text"]):
+            text = text.strip()
+            if text:
+                line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+                words.append((data["left"][i], data["top"][i], data["width"][i], data["height"][i], text, line))
+        return words
+
+class TesserocrBackend(OcrBackend):
+    """
+    In-process Tesseract through the tesserocr binding.
+    A TessBaseAPI is not thread-safe and loading one costs a language model, so
+    calls borrow one from a pool of at most `size` (OCR_WORKERS) APIs, created as
+    needed and kept for the app's lifetime; a call finding them all busy waits.
+    """
+    name = "tesserocr"
+
+    def __init__(self, size=OCR_WORKERS):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._size = max(size, 1)
+        # Last returned is lent first, so a light load keeps reusing the same warm API
+        self._idle = queue.LifoQueue()
+        self._apis = []
+        self._lock = threading.Lock()
+        # Fail now (and fall back) rather than on the first screen question
+        self._idle.put(self._new_api())
+
+    def _new_api(self):
+        """Creates an API and counts it against the pool size; None when the pool is full."""
+        with self._lock:
+            if len(self._apis) >= self._size:
+                return None
+            # Reserve the slot before the slow model load
+            self._apis.append(None)
+        try:
+            if TESSDATA_PATH:
+                api = self._tesserocr.PyTessBaseAPI(path=TESSDATA_PATH, lang=OCR_LANG)
+            else:
+                api = self._tesserocr.PyTessBaseAPI(lang=OCR_LANG)
+        except Exception:
+            with self._lock:
+                self._apis.remove(None)
+            raise
+        with self._lock:
+            self._apis[self._apis.index(None)] = api
+        return api
+
+    def warm(self, count):
+        # Created on the calling thread but owned by the pool, so any OCR thread can use them
+        with self._lock:
+            missing = min(count, self._size) - len(self._apis)
+        for _ in range(missing):
+            api = self._new_api()
+            if api is None:
+                break
+            self._idle.put(api)
+
+    @contextmanager
+    def _borrow(self):
+        try:
+            api = self._idle.get_nowait()
+        except queue.Empty:
+            api = self._new_api() or self._idle.get()
+        try:
+            yield api
+        finally:
+            self._idle.put(api)
+
+    def _recognize(self, api, gray):
+        height, width = gray.shape
+        api.SetImageBytes(gray.tobytes(), width, height, 1, width)
+        api.Recognize()
+
+    def read_text(self, gray):
+        with self._borrow() as api:
+            self._recognize(api, gray)
+            return api.GetUTF8Text()
+
+    def read_words(self, gray):
+        ril = self._tesserocr.RIL
+        level = ril.WORD
+        words = []
+        block = para = line = -1
+        # The iterator reads the API's results, so it is done before the API goes back
+        with self._borrow() as api:
+            self._recognize(api, gray)
+            for result in self._tesserocr.iterate_level(api.GetIterator(), level):
+                if result.IsAtBeginningOf(ril.BLOCK):
+                    block += 1
+                if result.IsAtBeginningOf(ril.PARA):
+                    para += 1
+                if result.IsAtBeginningOf(ril.TEXTLINE):
+                    line += 1
+                text = (result.GetUTF8Text(level) or "").strip()
+                box = result.BoundingBox(level)
+                if text and box:
+                    left, top, right, bottom = box
+                    words.append((left, top, right - left, bottom - top, text, (block, para, line)))
+        return words
+
+    def close(self):
+        with self._lock:
+            for api in self._apis:
+                if api is not None:
+                    api.End()
+            self._apis = []
+            self._idle = queue.LifoQueue()
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_backend(name=OCR_BACKEND):
+    """Builds the requested backend; 'auto' prefers tesserocr and falls back to pytesseract."""
+    if name in ("auto", "tesserocr"):
+        try:
+            return TesserocrBackend()
+        except Exception as e:
+            if name == "tesserocr":
+                print(f"tesserocr unavailable ({e}), falling back to pytesseract.")
+    return PytesseractBackend()
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+                print(f"OCR backend: {_backend.name}")
+    return _backend
+
+def warm_up():
+    """Creates the backend with an API for every tile worker (one in full-frame mode)."""
+    get_backend().warm(1 if OCR_MODE == "full" else OCR_WORKERS)
+
+def _gray(pixels, is_bgra):
+    """Contiguous 8-bit luminance of an RGB or BGRA array (integer BT.601 weights)."""
+    if pixels.ndim == 2:
+        return np.ascontiguousarray(pixels)
+    colour = pixels[..., :3].astype(np.uint16)
+    r, b = (colour[..., 2], colour[..., 0]) if is_bgra else (colour[..., 0], colour[..., 2])
+    return ((r * 77 + colour[..., 1] * 150 + b * 29) >> 8).astype(np.uint8)
+
 def extract_text(image):
     """
-    Extracts text from a PIL Image using Tesseract.
+    Extracts text from a PIL Image (or capture Frame) using Tesseract.
     """
+    if OCR_MODE == "tiled" or (OCR_MODE == "auto" and _is_large(image)):
+        return extract_text_tiled(image)
+
     try:
-        text = pytesseract.image_to_string(image)
+        with metrics.timed("ocr.full"):
+            pixels, is_bgra = _pixels(image)
+            text = get_backend().read_text(_gray(pixels, is_bgra))
         return text.strip()
     except Exception as e:
         print(f"OCR Error: {e}")
         return ""
+
+def _is_large(image):
+    width, height = image.size
+    return width * height > 2 * OCR_TILE_SIZE * OCR_TILE_SIZE
+
+# --- Tiled OCR ---
+# The frame is cut into a grid of core boxes. Each tile is OCR'd with an extra
+# OCR_TILE_OVERLAP margin so words on a seam are seen whole, and a word is kept
+# only by the tile whose core contains its centre. A word wider than the margin
+# is cut by the padded edge; it is read again from a wider strip. Lines come
+# from Tesseract's own layout inside each tile, so side-by-side columns stay
+# apart, and a line split by a seam is joined back up. Tiles whose pixels did
+# not change since the previous frame reuse their previous words.
+
+# Pixels from a padded edge within which a word counts as cut off
+EDGE_MARGIN = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# (frame size, padded box) -> (pixel digest, words)
+_previous_tiles = {}
+_previous_lock = threading.Lock()
+
+def _get_executor():
+    # Threads are enough: pytesseract runs tesseract in its own process and
+    # tesserocr releases the GIL while recognizing, so tiles spread across cores
+    # without pickling pixel data.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+        return _executor
+
+def _tile_boxes(width, height, tile_size=OCR_TILE_SIZE, overlap=OCR_TILE_OVERLAP):
+    """Returns (core, padded) box pairs. Core boxes partition the frame."""
+    boxes = []
+    for top in range(0, height, tile_size):
+        for left in range(0, width, tile_size):
+            core = (left, top, min(left + tile_size, width), min(top + tile_size, height))
+            padded = (
+                max(0, left - overlap),
+                max(0, top - overlap),
+                min(core[2] + overlap, width),
+                min(core[3] + overlap, height),
+            )
+            boxes.append((core, padded))
+    return boxes
+
+def _pixels(image):
+    """Returns (array, is_bgra). Frames are used in place; PIL images are converted once."""
+    if hasattr(image, "bgra"):
+        return image.bgra, True
+    return np.asarray(image.convert("RGB")), False
+
+def _region(pixels, box):
+    left, top, right, bottom = box
+    return pixels[top:bottom, left:right]
+
+def _tile_digest(region):
+    return hashlib.blake2b(np.ascontiguousarray(region), digest_size=16).digest()
+
+def _read_words(pixels, is_bgra, box):
+    """Words of one region as (x, y, w, h, text, line) in frame coordinates."""
+    return [
+        (x + box[0], y + box[1], w, h, text, line)
+        for x, y, w, h, text, line in get_backend().read_words(_gray(_region(pixels, box), is_bgra))
+    ]
+
+def _cut_edges(word, box, frame_size):
+    """Which sides of `box` cut through `word` (sides on the frame border never do)."""
+    x, y, w, h = word[:4]
+    width, height = frame_size
+    return (
+        box[0] > 0 and x - box[0] <= EDGE_MARGIN,
+        box[1] > 0 and y - box[1] <= EDGE_MARGIN,
+        box[2] < width and box[2] - (x + w) <= EDGE_MARGIN,
+        box[3] < height and box[3] - (y + h) <= EDGE_MARGIN,
+    )
+
+def _center_in(word, box):
+    center_x = word[0] + word[2] / 2
+    center_y = word[1] + word[3] / 2
+    return box[0] <= center_x < box[2] and box[1] <= center_y < box[3]
+
+def _intersects(word, box):
+    return word[0] < box[2] and word[0] + word[2] > box[0] and word[1] < box[3] and word[1] + word[3] > box[1]
+
+def _ocr_tile(pixels, is_bgra, core, padded):
+    colour = _region(pixels, padded)[..., :3]
+    if int(colour.max()) - int(colour.min()) < BLANK_TILE_RANGE:
+        metrics.increment("ocr.tiles_blank")
+        return []
+
+    height, width = pixels.shape[:2]
+    words = []
+    for word in _read_words(pixels, is_bgra, padded):
+        cut = _cut_edges(word, padded, (width, height))
+        if not any(cut):
+            if _center_in(word, core):
+                words.append(word)
+        elif _intersects(word, core):
+            # Only part of the word is in this tile; its centre is unknown until it is read whole
+            metrics.increment("ocr.words_reread")
+            for whole in _reread_cut_word(pixels, is_bgra, word, cut, padded, (width, height)):
+                if _center_in(whole, core) and whole[:5] not in [w[:5] for w in words]:
+                    words.append(whole)
+    return words
+
+def _reread_cut_word(pixels, is_bgra, word, cut, padded, frame_size):
+    """
+    OCRs a strip around a word cut by the tile edge, widened by half a tile on the
+    cut sides, and returns the words there that overlap the cut piece. They take
+    the piece's line id so they stay on its line.
+    """
+    x, y, w, h = word[:4]
+    width, height = frame_size
+    wide = OCR_TILE_SIZE // 2
+    strip = (
+        max(0, (padded[0] - wide) if cut[0] else x - h),
+        max(0, (padded[1] - wide) if cut[1] else y - h // 2),
+        min(width, (padded[2] + wide) if cut[2] else x + w + h),
+        min(height, (padded[3] + wide) if cut[3] else y + h + h // 2),
+    )
+    return [
+        whole[:5] + (word[5],)
+        for whole in _read_words(pixels, is_bgra, strip)
+        if _intersects(whole, (x, y, x + w, y + h))
+    ]
+
+def _same_line(a, b):
+    """True if two line segments from different tiles are parts of one text line."""
+    (a_left, a_top, a_right, a_bottom), (b_left, b_top, b_right, b_bottom) = a, b
+    overlap = min(a_bottom, b_bottom) - max(a_top, b_top)
+    line_height = min(a_bottom - a_top, b_bottom - b_top)
+    gap = max(a_left, b_left) - min(a_right, b_right)
+    # Vertically aligned and no further apart than a couple of word spaces
+    return overlap >= line_height / 2 and gap <= 2 * max(a_bottom - a_top, b_bottom - b_top)
+
+def _stitch(tiles):
+    """
+    Joins per-tile words into text. `tiles` is [(tile position, words)] in tile order.
+    Lines are Tesseract's (block, paragraph, line) groups within each tile; segments
+    of one line that a seam split between neighbouring tiles are merged, and blocks
+    are separated by a blank line like in full-frame OCR.
+    """
+    segments = []  # [order key, tile position, box, words]
+    for order, (position, words) in enumerate(tiles):
+        grouped = {}
+        for word in words:
+            grouped.setdefault(word[5], []).append(word)
+        for line, line_words in grouped.items():
+            box = (
+                min(w[0] for w in line_words), min(w[1] for w in line_words),
+                max(w[0] + w[2] for w in line_words), max(w[1] + w[3] for w in line_words),
+            )
+            segments.append([(order,) + tuple(line), position, box, line_words])
+
+    # Union segments of the same text line across neighbouring tiles
+    parent = list(range(len(segments)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    by_tile = {}
+    for i, segment in enumerate(segments):
+        by_tile.setdefault(segment[1], []).append(i)
+    for (row, col), indices in by_tile.items():
+        # Each pair of neighbouring tiles once: right, and the three below
+        for neighbour in ((row, col + 1), (row + 1, col - 1), (row + 1, col), (row + 1, col + 1)):
+            for i in indices:
+                for j in by_tile.get(neighbour, ()):
+                    if _same_line(segments[i][2], segments[j][2]):
+                        parent[find(j)] = find(i)
+
+    lines = {}
+    for i, segment in enumerate(segments):
+        root = find(i)
+        if root not in lines:
+            lines[root] = [segment[0], []]
+        lines[root][0] = min(lines[root][0], segment[0])
+        lines[root][1].extend(segment[3])
+
+    text = []
+    previous_block = None
+    for key, words in sorted(lines.values()):
+        block = key[:2]  # (tile, block)
+        if previous_block is not None and block != previous_block:
+            text.append("")
+        previous_block = block
+        text.append(" ".join(w[4] for w in sorted(words)))
+    return "\n".join(text)
+
+def extract_text_tiled(image):
+    """
+    Tiled, parallel OCR. Only tiles that changed since the previous call are re-OCR'd.
+    """
+    try:
+        with metrics.timed("ocr.tiled"):
+            pixels, is_bgra = _pixels(image)
+            height, width = pixels.shape[:2]
+
+            with _previous_lock:
+                previous = dict(_previous_tiles)
+
+            jobs = []
+            tiles = {}  # core box -> words
+            current = {}
+            for core, padded in _tile_boxes(width, height):
+                key = ((width, height), padded)
+                # Reread words can reach past the padded box; a change only out there
+                # is picked up once this tile's own pixels change
+                digest = _tile_digest(_region(pixels, padded))
+                cached = previous.get(key)
+                if cached is not None and cached[0] == digest:
+                    metrics.increment("ocr.tiles_reused")
+                    tiles[core] = cached[1]
+                    current[key] = cached
+                    continue
+                metrics.increment("ocr.tiles_ocred")
+                future = _get_executor().submit(_ocr_tile, pixels, is_bgra, core, padded)
+                jobs.append((key, core, digest, future))
+
+            for key, core, digest, future in jobs:
+                try:
+                    tile_words = future.result()
+                except Exception as e:
+                    print(f"OCR Error (tile {key[1]}): {e}")
+                    tile_words = []
+                else:
+                    current[key] = (digest, tile_words)
+                tiles[core] = tile_words
+
+            with _previous_lock:
+                _previous_tiles.clear()
+                _previous_tiles.update(current)
+
+            ordered = sorted(tiles.items(), key=lambda item: (item[0][1], item[0][0]))
+            return _stitch([
+                ((core[1] // OCR_TILE_SIZE, core[0] // OCR_TILE_SIZE), words)
+                for core, words in ordered
+            ]).strip()
+    except Exception as e:
+        print(f"OCR Error: {e}")
+        return ""
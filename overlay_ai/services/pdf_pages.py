@@ -0,0 +1,47 @@
+import io
+from pypdf import PdfReader
+from PIL import Image as PILImage
+from overlay_ai.services.encoding_service import downscale
+
+# Runs inside ingestion worker processes, so keep this module's imports light:
+# every worker re-imports it on spawn.
+
+def page_count(path):
+    return len(PdfReader(path).pages)
+
+def page_ranges(total, chunk_size):
+    """Splits [0, total) into (start, stop) ranges of at most `chunk_size` pages."""
+    return [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+
+def extract_pages(path, start, stop):
+    """
+    Extracts text and decodes embedded images for pages[start:stop].
+    Returns [(page_number, text, [PIL images])], page numbers starting at 1.
+    Images are downscaled here so less data is pickled back to the parent.
+    """
+    reader = PdfReader(path)
+    results = []
+    for i in range(start, stop):
+        page = reader.pages[i]
+        try:
+            text = page.extract_text()
+        except Exception as e:
+            print(f"Error extracting text on page {i}: {e}")
+            text = ""
+
+        images = []
+        try:
+            image_objects = list(page.images)
+        except Exception as e:
+            print(f"Error listing images on page {i}: {e}")
+            image_objects = []
+        for image_file_object in image_objects:
+            try:
+                img = PILImage.open(io.BytesIO(image_file_object.data))
+                img.load()
+                images.append(downscale(img))
+            except Exception as e:
+                print(f"Error processing image on page {i}: {e}")
+
+        results.append((i + 1, text, images))
+    return results
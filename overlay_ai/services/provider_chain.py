@@ -0,0 +1,212 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from overlay_ai.utils.config import AI_PROVIDERS, HEDGE_DELAY, CIRCUIT_FAILURES, CIRCUIT_RESET, CAPTION_CONCURRENCY
+from overlay_ai.utils.cancellation import RequestCancelled
+from overlay_ai.utils import metrics
+
+class ProviderError(Exception):
+    """A provider call failed; the message is the error text shown to the user."""
+
+class ProviderHealth:
+    """
+    Circuit breaker for one provider. After `max_failures` failures in a row the
+    provider is skipped for `reset_after` seconds, then a single trial call decides
+    whether it is back.
+    """
+
+    def __init__(self, name, max_failures=CIRCUIT_FAILURES, reset_after=CIRCUIT_RESET):
+        self.name = name
+        self.max_failures = max_failures
+        self.reset_after = reset_after
+        self.failures = 0
+        self.open_until = 0.0
+        self.last_error = ""
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def available(self):
+        """True if a call may go to this provider now. Claims the trial slot when half-open."""
+        with self._lock:
+            if self.failures < self.max_failures:
+                return True
+            if time.monotonic() < self.open_until or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self, seconds):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+        metrics.record_timing(f"provider.{self.name}.latency", seconds)
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            self._trial_running = False
+            if self.failures >= self.max_failures:
+                if time.monotonic() >= self.open_until:
+                    print(f"Provider {self.name} failed {self.failures} times in a row; pausing it for {self.reset_after:g}s.")
+                self.open_until = time.monotonic() + self.reset_after
+        metrics.increment(f"provider.{self.name}.failures")
+
+    def release(self):
+        """Gives back a trial slot from a call that was abandoned before it finished."""
+        with self._lock:
+            self._trial_running = False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "failures": self.failures,
+                "open": self.failures >= self.max_failures and time.monotonic() < self.open_until,
+                "last_error": self.last_error,
+            }
+
+_health = {name: ProviderHealth(name) for name in AI_PROVIDERS}
+
+# Attempts run here so a slow provider can be hedged while it is still working.
+# Sized so ingest captioning cannot starve a chat question.
+_executor = ThreadPoolExecutor(max_workers=CAPTION_CONCURRENCY + 4, thread_name_prefix="provider")
+
+def health():
+    """Circuit state per provider, in chain order."""
+    return {name: state.snapshot() for name, state in _health.items()}
+
+class _Attempt:
+    """One provider call. Its chunks reach the caller only once it has won the race."""
+
+    def __init__(self, race, provider):
+        self.race = race
+        self.provider = provider
+        self.streamed = False
+        self.future = None
+
+    def on_chunk(self, text):
+        if not self.race.claim(self):
+            # Another provider is already answering: stop this stream
+            raise RequestCancelled()
+        self.streamed = True
+        self.race.on_chunk(text)
+
+class _Race:
+    def __init__(self, on_chunk):
+        self.on_chunk = on_chunk
+        self.winner = None
+        self._lock = threading.Lock()
+
+    def claim(self, attempt):
+        with self._lock:
+            if self.winner is None:
+                self.winner = attempt
+            return self.winner is attempt
+
+def _call_single(provider, func, on_chunk, on_provider):
+    started = time.perf_counter()
+    try:
+        result = func(provider, on_chunk)
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        _health[provider].record_failure(e)
+        raise ProviderError(str(e))
+    _health[provider].record_success(time.perf_counter() - started)
+    if on_provider:
+        on_provider(provider)
+    return result
+
+def call(func, on_chunk=None, on_provider=None):
+    """
+    Runs `func(provider, on_chunk)` against the provider chain and returns the first
+    successful result. `func` raises on failure; the next provider is then tried,
+    unless the failed one had already streamed part of its answer. With HEDGE_DELAY
+    set, a call that has produced nothing after that many seconds is raced against
+    the next provider, and the first to answer (or to stream) wins.
+    `on_provider(name)` is told which provider's result is returned.
+    Raises ProviderError with the last error if every provider fails.
+    """
+    if len(AI_PROVIDERS) == 1:
+        # No chain configured: call the provider on this thread
+        return _call_single(AI_PROVIDERS[0], func, on_chunk, on_provider)
+
+    race = _Race(on_chunk)
+    pending = {}
+    queue = list(AI_PROVIDERS)
+    last_error = None
+    launched = []
+
+    def next_provider():
+        # Circuits are checked only when a provider is actually needed, so an open
+        # circuit's single trial slot is not claimed by a call that never uses it
+        while queue:
+            provider = queue.pop(0)
+            if _health[provider].available():
+                return provider
+            metrics.increment(f"provider.{provider}.skipped")
+        # Every circuit is open: better to try the primary than to fail outright
+        return None if launched else AI_PROVIDERS[0]
+
+    def launch():
+        provider = next_provider()
+        if provider is None:
+            return False
+        launched.append(provider)
+        attempt = _Attempt(race, provider)
+        started = time.perf_counter()
+
+        def run():
+            try:
+                result = func(provider, attempt.on_chunk if on_chunk else None)
+            except RequestCancelled:
+                _health[provider].release()
+                raise
+            except Exception as e:
+                _health[provider].record_failure(e)
+                raise
+            _health[provider].record_success(time.perf_counter() - started)
+            return result
+
+        attempt.future = _executor.submit(run)
+        pending[attempt.future] = attempt
+        return True
+
+    launch()
+    while pending:
+        hedge = HEDGE_DELAY > 0 and queue and race.winner is None
+        done, _ = wait(list(pending), timeout=HEDGE_DELAY if hedge else None, return_when=FIRST_COMPLETED)
+        if not done:
+            # Nothing yet from the providers in flight: hedge with the next one
+            if launch():
+                metrics.increment("provider.hedged")
+            continue
+
+        for future in done:
+            attempt = pending.pop(future)
+            try:
+                result = future.result()
+            except RequestCancelled:
+                if race.winner is attempt or race.winner is None:
+                    # The caller cancelled the answer that was streaming
+                    raise
+                continue
+            except Exception as e:
+                last_error = e
+                if attempt.streamed:
+                    # Part of this answer is already on screen; another provider cannot continue it
+                    raise ProviderError(str(e))
+                print(f"Provider {attempt.provider} failed: {e}")
+                if not pending and launch():
+                    metrics.increment("provider.failovers")
+                continue
+
+            if race.claim(attempt):
+                if attempt.provider != AI_PROVIDERS[0]:
+                    metrics.increment(f"provider.{attempt.provider}.answered_for_primary")
+                if on_provider:
+                    on_provider(attempt.provider)
+                return result
+            # A non-streamed result that lost to a provider already streaming is dropped
+
+    raise ProviderError(str(last_error) if last_error else "Error: No AI provider available.")
@@ -1,28 +1,88 @@
 import os
-import io
-from pypdf import PdfReader
-from PIL import Image as PILImage
+import hashlib
+import json
+import pickle
+import re
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed, wait
+)
+import faiss
+import numpy as np
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_community.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+try:
+    # langchain >= 1.0 moved these to the langchain-classic package
+    from langchain_classic.embeddings import CacheBackedEmbeddings
+    from langchain_classic.storage import LocalFileStore
+except ImportError:
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage import LocalFileStore
 
-from overlay_ai.utils.config import OPENAI_API_KEY, AI_PROVIDER, OLLAMA_BASE_URL, OLLAMA_MODEL
-from overlay_ai.services.llm_service import encode_image, client as openai_client
-# We might need a generic caption function if we want local captioning too, 
-# but for now captioning still uses OpenAI in the code below unless refactored.
+from overlay_ai.utils.config import (
+    OPENAI_API_KEY, AI_PROVIDER, OLLAMA_BASE_URL, OLLAMA_MODEL, INGEST_WORKERS, CAPTION_CONCURRENCY,
+    RAG_INDEX_TYPE, RAG_MMAP_INDEX, RAG_RETRIEVAL_MODE, RAG_EMBED_TIMEOUT, RAG_EMBED_RETRY_AFTER,
+    RAG_QUERY_CACHE_SIZE, RAG_RESULT_CACHE_SIZE
+)
+from overlay_ai.services.pdf_pages import page_count, page_ranges, extract_pages
+from overlay_ai.services.keyword_index import KeywordIndex, reciprocal_rank_fusion
+from overlay_ai.services.vector_index import index_kind, build_index, stored_vectors, read_index, min_training_vectors
+from overlay_ai.utils import metrics
+from overlay_ai.utils.lru import LRUCache
+from overlay_ai.utils.files import atomic_write
 # Let's import query_assistant to use the generic provider for captioning!
-from overlay_ai.services.llm_service import query_assistant 
+from overlay_ai.services.llm_service import query_assistant, is_error_response, current_model_id
+from overlay_ai.services.caption_cache import caption_cache, content_hash
 
 # Define persistence path
 INDEX_PATH = os.path.join(os.path.dirname(__file__), "manual_store", "faiss_index")
+MANIFEST_FILE = "manifest.json"
+KEYWORD_INDEX_FILE = "keyword_index.json"
+# Chunk embeddings keyed by model + text hash; survives clear_index so re-ingests are free
+EMBEDDING_CACHE_PATH = os.path.join(os.path.dirname(__file__), "manual_store", "embedding_cache")
+
+# Pages handed to one worker process at a time, and the size below which
+# spawning worker processes costs more than it saves
+PAGES_PER_TASK = 8
+MIN_PAGES_FOR_POOL = 16
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(text):
+    """Content-addressed vector ID: identical chunk text always maps to the same ID."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class CountingEmbeddings(Embeddings):
+    """Pass-through that counts the texts actually sent to the embedding backend."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def embed_documents(self, texts):
+        metrics.increment("embeddings.documents", len(texts))
+        with metrics.timed("embeddings.embed_documents"):
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        metrics.increment("embeddings.queries")
+        with metrics.timed("embeddings.embed_query"):
+            return self.inner.embed_query(text)
 
 class RAGService:
     def __init__(self):
         if AI_PROVIDER == "ollama":
-            self.embeddings = OllamaEmbeddings(
+            base_embeddings = OllamaEmbeddings(
                 base_url=OLLAMA_BASE_URL, 
                 model=OLLAMA_MODEL # Use the same model or a specific embedding model?
                 # Usually 'llava' isn't an embedding model. 'nomic-embed-text' is better.
@@ -37,37 +97,257 @@ class RAGService:
             # Let's assume user installs 'nomic-embed-text' or similar. 
             # Ideally config should specify EMBEDDING_MODEL.
             # For this iteration, let's just use "nomic-embed-text" as default for embeddings if provider is ollama.
-            self.embeddings.model = "nomic-embed-text"
+            base_embeddings.model = "nomic-embed-text"
+            self.embedding_model = f"ollama:{base_embeddings.model}"
         else:
-            self.embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+            base_embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+            self.embedding_model = f"openai:{base_embeddings.model}"
+
+        # Document embeddings go through a persistent cache; namespaced by model so
+        # switching providers never mixes vectors from different embedding spaces.
+        self.embeddings = CacheBackedEmbeddings.from_bytes_store(
+            CountingEmbeddings(base_embeddings),
+            LocalFileStore(EMBEDDING_CACHE_PATH),
+            # LocalFileStore keys only allow [A-Za-z0-9_.-/], so "openai:..." must be escaped
+            namespace=re.sub(r"[^A-Za-z0-9_.\-]", "_", self.embedding_model)
+        )
             
         self.db = None
+        self._index_mmapped = False
+        # Source path -> {"name", "content_hash", "ids", "chunks", "ingested_at"}
+        self.manifest = {}
+        # BM25 index over the same chunk IDs as the vector store
+        self.keywords = KeywordIndex()
+        # Guards self.db, self.manifest and self.keywords; embedding happens outside it
+        self._lock = threading.RLock()
+        # Query embeddings run here so a slow backend can be abandoned after RAG_EMBED_TIMEOUT
+        self._embed_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-embed")
+        self._embed_unavailable_until = 0.0
+        # Query text -> embedding future still running (possibly abandoned by a timed-out caller)
+        self._pending_embeds = {}
+        # Query text -> (embedding, seconds it took). Independent of the index contents.
+        self._query_embeddings = LRUCache(RAG_QUERY_CACHE_SIZE)
+        # (query, k, mode, index version) -> (documents, seconds it took).
+        # Bumping the version on every index change makes old entries unreachable.
+        self._results = LRUCache(RAG_RESULT_CACHE_SIZE)
+        self._index_version = 0
         self.load_index()
 
     def load_index(self):
         if os.path.exists(INDEX_PATH) and os.path.isdir(INDEX_PATH):
             try:
-                self.db = FAISS.load_local(INDEX_PATH, self.embeddings, allow_dangerous_deserialization=True)
+                # Same files FAISS.save_local writes, but the index is memory-mapped
+                # instead of deserialized so startup does not read every vector.
+                with metrics.timed("startup.rag_index_load"):
+                    index, self._index_mmapped = read_index(os.path.join(INDEX_PATH, "index.faiss"), mmap=RAG_MMAP_INDEX)
+                    with open(os.path.join(INDEX_PATH, "index.pkl"), "rb") as f:
+                        docstore, index_to_docstore_id = pickle.load(f)
+                    self.db = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
             except Exception as e:
                 print(f"Failed to load index: {e}")
                 self.db = None
+            self.manifest = self._load_manifest()
+            self.keywords = self._load_keywords()
+            if self.db and self._migrate_legacy_ids():
+                self.save_index()
+            self._index_changed()
+
+    def _index_changed(self):
+        """Invalidates cached retrieval results. Call with self._lock held."""
+        self._index_version += 1
+        self._results.clear()
+
+    def _load_keywords(self):
+        path = os.path.join(INDEX_PATH, KEYWORD_INDEX_FILE)
+        try:
+            keywords = KeywordIndex.load(path)
+        except Exception as e:
+            print(f"Failed to load keyword index: {e}")
+            keywords = KeywordIndex()
+        if self.db and not len(keywords):
+            # Index built before keyword search existed: index what the docstore holds
+            for doc_id in self.db.index_to_docstore_id.values():
+                doc = self._document(doc_id)
+                if doc is not None:
+                    keywords.add(doc_id, doc.page_content)
+        return keywords
+
+    def _document(self, doc_id):
+        doc = self.db.docstore.search(doc_id)
+        # InMemoryDocstore returns an error string for unknown IDs
+        return doc if isinstance(doc, Document) else None
+
+    def _ensure_writable(self):
+        """A memory-mapped index is read-only; swap in an in-memory copy before changing it."""
+        if self.db and self._index_mmapped:
+            self.db.index, _ = read_index(os.path.join(INDEX_PATH, "index.faiss"), mmap=False)
+            self._index_mmapped = False
+
+    def _rebuild_index(self, exclude=frozenset()):
+        """
+        Rebuilds the FAISS index as RAG_INDEX_TYPE from the vectors it holds, minus `exclude` IDs.
+        Used to train an ANN index once enough vectors exist, and for removals on index
+        types that cannot delete in place.
+        """
+        positions = sorted(self.db.index_to_docstore_id.items())
+        keep = [(pos, doc_id) for pos, doc_id in positions if doc_id not in exclude]
+        vectors = stored_vectors(self.db.index)
+        if vectors is None:
+            # Compressed index: the exact vectors come back from the embedding cache
+            texts = [self.db.docstore.search(doc_id).page_content for _, doc_id in keep]
+            rows = np.array(self.embeddings.embed_documents(texts), dtype=np.float32).reshape(len(keep), self.db.index.d)
+        else:
+            rows = vectors[[pos for pos, _ in keep]]
+
+        with metrics.timed("rag.index_rebuild"):
+            self.db.index = build_index(rows) if keep else faiss.IndexFlatL2(self.db.index.d)
+        self.db.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(keep)}
+        dropped = [doc_id for _, doc_id in positions if doc_id in exclude]
+        if dropped:
+            self.db.docstore.delete(dropped)
+
+    def _maybe_upgrade_index(self):
+        """Switches from the initial flat index to RAG_INDEX_TYPE once there is enough data to train it."""
+        if RAG_INDEX_TYPE == "flat" or index_kind(self.db.index) != "flat":
+            return
+        if self.db.index.ntotal >= min_training_vectors(RAG_INDEX_TYPE, self.db.index.ntotal):
+            print(f"Building {RAG_INDEX_TYPE} index over {self.db.index.ntotal} vectors...")
+            self._rebuild_index()
+
+    def _load_manifest(self):
+        path = os.path.join(INDEX_PATH, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("documents", {})
+        except Exception as e:
+            print(f"Failed to load manifest: {e}")
+            return {}
+
+    def _migrate_legacy_ids(self):
+        """
+        Indexes built before chunk IDs were content-addressed use random UUIDs, so
+        re-ingesting their documents would add every chunk again. Re-keys such chunks
+        by chunk_id, keeping one vector per distinct text. Returns True if anything changed.
+        """
+        renamed = {}
+        for doc_id in self.db.index_to_docstore_id.values():
+            doc = self._document(doc_id)
+            if doc is not None and chunk_id(doc.page_content) != doc_id:
+                renamed[doc_id] = chunk_id(doc.page_content)
+        if not renamed:
+            return False
+
+        print(f"Re-keying {len(renamed)} chunks of an older index by content...")
+        self._ensure_writable()
+        seen, duplicates = set(), set()
+        for _, doc_id in sorted(self.db.index_to_docstore_id.items()):
+            new_id = renamed.get(doc_id, doc_id)
+            if new_id in seen:
+                duplicates.add(doc_id)
+            seen.add(new_id)
+        if duplicates:
+            self._rebuild_index(exclude=duplicates)
+
+        documents = {}
+        for doc_id in self.db.index_to_docstore_id.values():
+            if doc_id in renamed:
+                documents[renamed[doc_id]] = self._document(doc_id)
+        self.db.docstore.delete(list(set(renamed) - duplicates))
+        self.db.docstore.add(documents)
+        self.db.index_to_docstore_id = {
+            position: renamed.get(doc_id, doc_id) for position, doc_id in self.db.index_to_docstore_id.items()
+        }
+        for entry in self.manifest.values():
+            entry["ids"] = list(dict.fromkeys(renamed.get(doc_id, doc_id) for doc_id in entry["ids"]))
+            entry["chunks"] = len(entry["ids"])
+
+        self.keywords = KeywordIndex()
+        for doc_id in self.db.index_to_docstore_id.values():
+            self.keywords.add(doc_id, self._document(doc_id).page_content)
+        metrics.increment("rag.legacy_ids_migrated", len(renamed))
+        return True
 
     def save_index(self):
+        """Writes every file through a temp copy, so a crash mid-save leaves the previous version."""
         if self.db:
-            self.db.save_local(INDEX_PATH)
+            # FAISS.save_local writes index.faiss and index.pkl in place; save next door and move them
+            staging = f"{INDEX_PATH}.tmp"
+            self.db.save_local(staging)
+            os.makedirs(INDEX_PATH, exist_ok=True)
+            for name in ("index.faiss", "index.pkl"):
+                os.replace(os.path.join(staging, name), os.path.join(INDEX_PATH, name))
+            with atomic_write(os.path.join(INDEX_PATH, MANIFEST_FILE)) as f:
+                json.dump({"documents": self.manifest}, f, indent=1)
+            self.keywords.save(os.path.join(INDEX_PATH, KEYWORD_INDEX_FILE))
+
+    def list_documents(self):
+        """What is indexed: one dict per source document."""
+        with self._lock:
+            return [
+                {"source": source, "name": entry["name"], "chunks": entry["chunks"], "ingested_at": entry["ingested_at"]}
+                for source, entry in sorted(self.manifest.items(), key=lambda item: item[1]["name"].lower())
+            ]
 
-    def ingest_file(self, file_path):
+    def _ids_used_elsewhere(self, source):
+        used = set()
+        for other, entry in self.manifest.items():
+            if other != source:
+                used.update(entry["ids"])
+        return used
+
+    def _delete_vectors(self, ids):
+        if not self.db or not ids:
+            return
+        for doc_id in ids:
+            doc = self._document(doc_id)
+            if doc is not None:
+                self.keywords.remove(doc_id, doc.page_content)
+        if index_kind(self.db.index) == "flat":
+            self.db.delete(list(ids))
+        else:
+            # IVF keeps stale positions after remove_ids and HNSW cannot remove at all
+            self._rebuild_index(exclude=set(ids))
+
+    def remove_document(self, file_path):
+        """Drops one document's vectors from the index, keeping chunks other documents share."""
+        source = os.path.abspath(file_path)
+        with self._lock:
+            entry = self.manifest.get(source)
+            if entry is None:
+                return f"{os.path.basename(file_path)} is not indexed."
+            self._ensure_writable()
+            stale = set(entry["ids"]) - self._ids_used_elsewhere(source)
+            self._delete_vectors(stale)
+            del self.manifest[source]
+            self._index_changed()
+            self.save_index()
+        return f"Removed {entry['name']} ({len(stale)} chunks)."
+
+    def ingest_file(self, file_path, progress=None):
         """
         Ingests a file (PDF, DOCX, TXT).
         Extracts text AND images (PDF only for now).
         Captions images.
         Updates vector store.
+        Re-ingesting a path replaces that document in place: unchanged files are
+        skipped outright and only chunks that changed are added or removed.
+        `progress(stage, done, total)` is called as pages and images are processed.
         """
+        source = os.path.abspath(file_path)
+        name = os.path.basename(file_path)
+        content_hash = file_hash(source)
+        with self._lock:
+            previous = self.manifest.get(source)
+        if previous and previous["content_hash"] == content_hash:
+            return f"{name} is already indexed and unchanged."
+
         ext = os.path.splitext(file_path)[1].lower()
         documents = []
 
         if ext == ".pdf":
-            documents = self._process_pdf(file_path)
+            documents = self._process_pdf(file_path, progress)
         elif ext == ".txt":
             with open(file_path, "r", encoding="utf-8") as f:
                 documents = [Document(page_content=f.read(), metadata={"source": file_path})]
@@ -79,47 +359,178 @@ class RAGService:
         # Split content
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
         chunks = text_splitter.split_documents(documents)
+        doc_ids = list(dict.fromkeys(chunk_id(c.page_content) for c in chunks))
 
-        # Add to DB
-        if self.db:
-            self.db.add_documents(chunks)
-        else:
-            self.db = FAISS.from_documents(chunks, self.embeddings)
-        
-        self.save_index()
-        return f"Ingested {len(chunks)} chunks from {os.path.basename(file_path)}."
+        # Skip chunks that are already indexed (or repeated within this file)
+        with self._lock:
+            new_chunks, ids = self._dedupe_chunks(chunks)
+        skipped = len(chunks) - len(new_chunks)
+        metrics.increment("ingest.duplicate_chunks", skipped)
+
+        # Embed outside the lock so retrieval keeps working during a long ingest
+        vectors = self.embeddings.embed_documents([c.page_content for c in new_chunks]) if new_chunks else []
 
-    def _process_pdf(self, path):
-        reader = PdfReader(path)
+        with self._lock:
+            self._ensure_writable()
+            # Another ingest may have added some of the same chunks while we were embedding
+            if new_chunks and self.db:
+                indexed = set(self.db.index_to_docstore_id.values())
+                fresh = [i for i, cid in enumerate(ids) if cid not in indexed]
+                if len(fresh) < len(ids):
+                    new_chunks = [new_chunks[i] for i in fresh]
+                    vectors = [vectors[i] for i in fresh]
+                    ids = [ids[i] for i in fresh]
+            # Add to DB
+            if new_chunks:
+                pairs = list(zip([c.page_content for c in new_chunks], vectors))
+                metadatas = [c.metadata for c in new_chunks]
+                if self.db:
+                    self.db.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+                else:
+                    self.db = FAISS.from_embeddings(pairs, self.embeddings, metadatas=metadatas, ids=ids)
+                for cid, chunk in zip(ids, new_chunks):
+                    self.keywords.add(cid, chunk.page_content)
+                self._maybe_upgrade_index()
+
+            # Drop chunks the previous version had that nothing references any more
+            removed = 0
+            if previous:
+                stale = set(previous["ids"]) - set(doc_ids) - self._ids_used_elsewhere(source)
+                self._delete_vectors(stale)
+                removed = len(stale)
+
+            self.manifest[source] = {
+                "name": name,
+                "content_hash": content_hash,
+                "ids": doc_ids,
+                "chunks": len(doc_ids),
+                "ingested_at": time.time(),
+            }
+            self._index_changed()
+            self.save_index()
+
+        if previous:
+            return f"Updated {name}: {len(new_chunks)} chunks added, {removed} removed."
+        if skipped:
+            return f"Ingested {len(new_chunks)} new chunks from {name} ({skipped} already indexed)."
+        return f"Ingested {len(new_chunks)} chunks from {name}."
+
+    def _dedupe_chunks(self, chunks):
+        """Returns (chunks, ids) for chunks whose text is not in the index yet."""
+        existing = set(self.db.index_to_docstore_id.values()) if self.db else set()
+        new_chunks, ids = [], []
+        for chunk in chunks:
+            cid = chunk_id(chunk.page_content)
+            if cid in existing:
+                continue
+            existing.add(cid)
+            new_chunks.append(chunk)
+            ids.append(cid)
+        return new_chunks, ids
+
+    def _process_pdf(self, path, progress=None):
+        # Pages arrive in extract_pages batches (fanned out over worker processes) and
+        # each batch's images are captioned before the next is taken, with bounded
+        # concurrency (each caption is a model call). Only image hashes and captions
+        # are kept across batches, so a manual's decoded images are never all in memory.
+        # Identical images (logos, icons, headers) are captioned once per file.
+        pages = []  # (page_number, text, [image hash])
+        captions = {}
+        images_total = 0
+        with ThreadPoolExecutor(max_workers=CAPTION_CONCURRENCY) as pool:
+            for batch in self._extract_pdf_pages(path, progress):
+                futures = {}
+                for page_no, text, images in batch:
+                    keys = [content_hash(img) for img in images]
+                    for key, img in zip(keys, images):
+                        if key not in captions and key not in futures:
+                            futures[pool.submit(self._caption_image, img, key)] = key
+                    pages.append((page_no, text, keys))
+                if not futures:
+                    continue
+                images_total += len(futures)
+                with metrics.timed("ingest.captions"):
+                    for future in as_completed(futures):
+                        captions[futures[future]] = future.result()
+                        if progress:
+                            progress("images", len(captions), images_total)
+
+        # Assemble documents in page order
         documents = []
-        
-        for i, page in enumerate(reader.pages):
-            # 1. Extract Text
-            text = page.extract_text()
+        for page_no, text, keys in sorted(pages, key=lambda p: p[0]):
             if text:
-                documents.append(Document(page_content=text, metadata={"source": path, "page": i + 1}))
-            
-            # 2. Extract Images
-            for image_file_object in page.images:
-                try:
-                    # image_file_object.name, .data
-                    img = PILImage.open(io.BytesIO(image_file_object.data))
-                    
-                    # Generate Caption using Vision LLM
-                    caption = self._caption_image(img)
-                    
-                    if caption:
-                        content = f"[IMAGE ON PAGE {i+1}]: {caption}"
-                        documents.append(Document(page_content=content, metadata={"source": path, "page": i + 1, "type": "image_caption"}))
-                except Exception as e:
-                    print(f"Error processing image on page {i}: {e}")
+                documents.append(Document(page_content=text, metadata={"source": path, "page": page_no}))
+            for key in keys:
+                caption = captions.get(key)
+                if caption:
+                    content = f"[IMAGE ON PAGE {page_no}]: {caption}"
+                    documents.append(Document(page_content=content, metadata={"source": path, "page": page_no, "type": "image_caption"}))
                     
         return documents
 
-    def _caption_image(self, pil_image):
+    def _extract_pdf_pages(self, path, progress=None):
+        """
+        Yields [(page_number, text, images)] one extract_pages batch at a time, in the
+        order the batches finish. Workers stay at most INGEST_WORKERS batches ahead of
+        the caller, so decoded images do not pile up while it captions.
+        """
+        total = page_count(path)
+        ranges = page_ranges(total, PAGES_PER_TASK)
+        remaining = list(ranges)
+        extracted = 0
+
+        def _report(batch):
+            nonlocal extracted
+            extracted += len(batch)
+            if progress:
+                progress("pages", extracted, total)
+
+        if total >= MIN_PAGES_FOR_POOL and INGEST_WORKERS > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=min(INGEST_WORKERS, len(ranges))) as pool:
+                    queued = iter(ranges)
+                    running = {}
+
+                    def _submit_next():
+                        page_range = next(queued, None)
+                        if page_range is not None:
+                            running[pool.submit(extract_pages, path, *page_range)] = page_range
+
+                    for _ in range(INGEST_WORKERS):
+                        _submit_next()
+                    while running:
+                        with metrics.timed("ingest.pdf_extract"):
+                            done, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            batch = future.result()
+                            remaining.remove(running.pop(future))
+                            # Keep the workers busy while the caller handles this batch
+                            _submit_next()
+                            _report(batch)
+                            yield batch
+                metrics.increment("ingest.pages", total)
+                return
+            except Exception as e:
+                print(f"Parallel PDF extraction failed ({e}), falling back to serial.")
+
+        # Serial, or whatever the pool did not get to
+        for start, stop in list(remaining):
+            with metrics.timed("ingest.pdf_extract"):
+                batch = extract_pages(path, start, stop)
+            _report(batch)
+            yield batch
+        metrics.increment("ingest.pages", total)
+
+    def _caption_image(self, pil_image, key=None):
         """
         Uses the configured AI Provider to describe the image.
+        Captions are cached on disk by image content, so repeated images cost one call.
         """
+        model_id = current_model_id()
+        cached = caption_cache.get(pil_image, model_id, key)
+        if cached is not None:
+            return cached
+
         try:
             # Re-use our generic query service!
             # We treat this as a simple query with an image.
@@ -127,20 +538,119 @@ class RAGService:
                 user_text="Describe this image in detail for a technical manual.",
                 image=pil_image
             )
-            return description
         except Exception as e:
             print(f"Captioning error: {e}")
             return ""
 
+        if not is_error_response(description):
+            caption_cache.put(pil_image, model_id, description, key)
+        return description
+
     def retrieve(self, query, k=3):
-        if not self.db:
-            return ""
-        
-        docs = self.db.similarity_search(query, k=k)
+        docs = self.retrieve_documents(query, k)
         return "\n\n".join([d.page_content for d in docs])
 
+    def retrieve_documents(self, query, k=3):
+        """
+        Top-k chunks for `query`. In hybrid mode the BM25 and vector rankings are merged
+        with reciprocal-rank fusion; if the embedding backend is slow or down, the
+        keyword ranking is used alone.
+        """
+        if not self.db:
+            return []
+
+        key = (" ".join(query.split()), k, RAG_RETRIEVAL_MODE, self._index_version)
+        cached = self._results.get(key)
+        if cached is not None:
+            docs, elapsed = cached
+            metrics.increment("rag.result_cache.hits")
+            metrics.record_timing("rag.result_cache.saved", elapsed)
+            return list(docs)
+        metrics.increment("rag.result_cache.misses")
+
+        started = time.perf_counter()
+        degraded = False
+        rankings = []
+        if RAG_RETRIEVAL_MODE != "vector":
+            with metrics.timed("rag.keyword_search"):
+                rankings.append([doc_id for doc_id, _ in self.keywords.search(query, k * 4)])
+        if RAG_RETRIEVAL_MODE != "keyword":
+            vector_ids = self._vector_search(query, k * 4)
+            if vector_ids is None:
+                metrics.increment("rag.keyword_fallback")
+                degraded = True
+            else:
+                rankings.append(vector_ids)
+
+        if not rankings:
+            return []
+        fused = rankings[0] if len(rankings) == 1 else reciprocal_rank_fusion(rankings)
+        with self._lock:
+            if not self.db:
+                return []
+            docs = [d for d in (self._document(doc_id) for doc_id in fused[:k]) if d is not None]
+            # Keyword-only fallbacks are not cached so the next ask gets the full ranking;
+            # a version change while searching means the result may already be stale.
+            if not degraded and key[3] == self._index_version:
+                self._results.put(key, (docs, time.perf_counter() - started))
+        return list(docs)
+
+    def embed_query(self, query):
+        """Query embedding, or None if the backend is down or slower than RAG_EMBED_TIMEOUT."""
+        cached = self._query_embeddings.get(query)
+        if cached is not None:
+            vector, elapsed = cached
+            metrics.increment("rag.query_cache.hits")
+            metrics.record_timing("rag.query_cache.saved", elapsed)
+            return vector
+        metrics.increment("rag.query_cache.misses")
+        if time.monotonic() < self._embed_unavailable_until:
+            return None
+        with self._lock:
+            # A slow embedding of the same query is still running: wait on it instead of queueing another
+            future = self._pending_embeds.get(query)
+            if future is None:
+                future = self._embed_executor.submit(self.embeddings.embed_query, query)
+                self._pending_embeds[query] = future
+                started = time.perf_counter()
+                future.add_done_callback(lambda done: self._embedded(query, done, started))
+        try:
+            return future.result(timeout=RAG_EMBED_TIMEOUT)
+        except FutureTimeout:
+            print(f"Query embedding took longer than {RAG_EMBED_TIMEOUT}s, using keyword search.")
+        except Exception as e:
+            print(f"Query embedding failed ({e}), using keyword search.")
+        # Don't wait on a dead or overloaded backend for every question
+        self._embed_unavailable_until = time.monotonic() + RAG_EMBED_RETRY_AFTER
+        return None
+
+    def _embedded(self, query, future, started):
+        """Caches a finished query embedding, including one its caller stopped waiting for."""
+        with self._lock:
+            self._pending_embeds.pop(query, None)
+        if not future.cancelled() and future.exception() is None:
+            self._query_embeddings.put(query, (future.result(), time.perf_counter() - started))
+
+    def _vector_search(self, query, k):
+        """Chunk IDs nearest to `query`, or None when no embedding is available."""
+        query_vector = self.embed_query(query)
+        if query_vector is None:
+            return None
+        with metrics.timed("rag.vector_search"), self._lock:
+            if not self.db:
+                return []
+            _, positions = self.db.index.search(np.array([query_vector], dtype=np.float32), k)
+            mapping = self.db.index_to_docstore_id
+            return [mapping[p] for p in positions[0] if p != -1 and p in mapping]
+
     def clear_index(self):
-        self.db = None
+        with self._lock:
+            # Dropping the index also unmaps its file so it can be deleted
+            self.db = None
+            self._index_mmapped = False
+            self.manifest = {}
+            self.keywords.clear()
+            self._index_changed()
         if os.path.exists(INDEX_PATH):
             import shutil
             try:
@@ -150,5 +660,16 @@ class RAGService:
                 return f"Failed to clear index: {e}"
         return "No index found to clear."
 
-# Singleton instance
-rag_service = RAGService()
+# Singleton instance, built on first use.
+# Importing this module pulls in langchain/FAISS, so import it lazily as well.
+_rag_service = None
+_rag_service_lock = threading.Lock()
+
+def get_rag_service():
+    global _rag_service
+    if _rag_service is None:
+        with _rag_service_lock:
+            if _rag_service is None:
+                with metrics.timed("startup.rag_service"):
+                    _rag_service = RAGService()
+    return _rag_service
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from overlay_ai.utils.config import (
+    RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIMILARITY
+)
+from overlay_ai.utils import metrics
+
+def normalize_question(text):
+    """Lower-cased, whitespace-collapsed question without trailing punctuation."""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+def context_fingerprint(chunks):
+    """Identifies the retrieved manual chunks an answer was grounded on."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(hashlib.sha256(chunk.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+class ResponseCache:
+    """
+    On-disk cache of answers to text-only questions, keyed by provider/model and the
+    fingerprint of the context (retrieved chunks and earlier turns). A question matches
+    a cached one if the normalized text is equal or the embeddings are at least
+    `similarity` cosine-similar.
+    Entries expire after `ttl` seconds; the least recently used go beyond `max_entries`.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_entries=RESPONSE_CACHE_SIZE,
+                 ttl=RESPONSE_CACHE_TTL, similarity=RESPONSE_CACHE_SIMILARITY):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " model TEXT NOT NULL,"
+                " context_hash TEXT NOT NULL,"
+                " question TEXT NOT NULL,"
+                " embedding BLOB,"
+                " answer TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (model, context_hash, question))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+            self._conn.commit()
+        return self._conn
+
+    def _closest(self, conn, model, context_hash, vector, oldest):
+        """Best cached question for the same model and context by cosine similarity."""
+        query = np.asarray(vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if not query_norm:
+            return None
+        best, best_score = None, self.similarity
+        rows = conn.execute(
+            "SELECT question, embedding FROM responses"
+            " WHERE model = ? AND context_hash = ? AND created_at >= ? AND embedding IS NOT NULL",
+            (model, context_hash, oldest)
+        )
+        for question, blob in rows:
+            cached = np.frombuffer(blob, dtype=np.float32)
+            if cached.shape != query.shape:
+                continue
+            score = float(np.dot(query, cached) / (query_norm * np.linalg.norm(cached)))
+            if score >= best_score:
+                best, best_score = question, score
+        return best
+
+    def get(self, question, model, context_hash, vector=None):
+        """Returns the cached answer or None. `vector` is the question's embedding, if available."""
+        key = normalize_question(question)
+        oldest = time.time() - self.ttl if self.ttl > 0 else 0
+        with self._lock:
+            conn = self._connect()
+            lookup = (
+                "SELECT answer FROM responses"
+                " WHERE model = ? AND context_hash = ? AND question = ? AND created_at >= ?"
+            )
+            row = conn.execute(lookup, (model, context_hash, key, oldest)).fetchone()
+            matched = key
+            if row is None and vector is not None and self.similarity < 1:
+                matched = self._closest(conn, model, context_hash, vector, oldest)
+                if matched is not None:
+                    row = conn.execute(lookup, (model, context_hash, matched, oldest)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                metrics.increment("response_cache.misses")
+                return None
+
+            if matched == key:
+                self.hits += 1
+                metrics.increment("response_cache.hits")
+            else:
+                self.similar_hits += 1
+                metrics.increment("response_cache.similar_hits")
+            conn.execute(
+                "UPDATE responses SET last_used = ?, hits = hits + 1"
+                " WHERE model = ? AND context_hash = ? AND question = ?",
+                (time.time(), model, context_hash, matched)
+            )
+            conn.commit()
+            return row[0]
+
+    def put(self, question, model, context_hash, answer, vector=None):
+        blob = np.asarray(vector, dtype=np.float32).tobytes() if vector is not None else None
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (model, context_hash, question, embedding, answer, created_at, last_used, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (model, context_hash, normalize_question(question), blob, answer, now, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn, now):
+        if self.ttl > 0:
+            expired = conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+            if expired > 0:
+                metrics.increment("response_cache.expired", expired)
+        count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        metrics.increment("response_cache.evictions", excess)
+
+    def stats(self):
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "similar_hits": self.similar_hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+# Singleton instance
+response_cache = ResponseCache()
@@ -0,0 +1,96 @@
+import math
+import faiss
+import numpy as np
+from overlay_ai.utils.config import (
+    RAG_INDEX_TYPE, RAG_IVF_NLIST, RAG_IVF_NPROBE, RAG_HNSW_M, RAG_HNSW_EF_SEARCH, RAG_PQ_M
+)
+
+# FAISS index construction for the manual store.
+# 'flat' is exact search; 'ivf', 'hnsw' and 'ivfpq' trade a little recall for
+# sub-linear search (and, for 'ivfpq', much smaller vectors).
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+
+# FAISS warns below ~39 training points per IVF centroid
+TRAINING_POINTS_PER_LIST = 39
+
+def index_kind(index):
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+def nlist_for(count, nlist=RAG_IVF_NLIST):
+    """Inverted lists for `count` vectors: configured value, or about 4 * sqrt(n)."""
+    if nlist > 0:
+        return nlist
+    return max(1, int(4 * math.sqrt(count)))
+
+def min_training_vectors(index_type=RAG_INDEX_TYPE, count=0):
+    if index_type in ("ivf", "ivfpq"):
+        return TRAINING_POINTS_PER_LIST * nlist_for(count)
+    if index_type == "hnsw":
+        # HNSW needs no training, but a graph over a handful of vectors is pointless
+        return 1000
+    return 0
+
+def configure_search(index):
+    kind = index_kind(index)
+    if kind in ("ivf", "ivfpq"):
+        faiss.extract_index_ivf(index).nprobe = RAG_IVF_NPROBE
+    elif kind == "hnsw":
+        index.hnsw.efSearch = RAG_HNSW_EF_SEARCH
+    return index
+
+def build_index(vectors, index_type=RAG_INDEX_TYPE):
+    """
+    Builds, trains and fills an index of `index_type` with `vectors` (float32, n x d)
+    in order, so positions match the input rows. Falls back to flat when there
+    are too few vectors to train.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    if index_type not in INDEX_TYPES or count < min_training_vectors(index_type, count):
+        index_type = "flat"
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, RAG_HNSW_M)
+    elif index_type in ("ivf", "ivfpq"):
+        nlist = nlist_for(count)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivfpq":
+            # Sub-quantizers must divide the dimension
+            pq_m = RAG_PQ_M if dim % RAG_PQ_M == 0 else next(m for m in (64, 48, 32, 16, 8, 4, 2, 1) if dim % m == 0)
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, 8)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        index.train(vectors)
+    else:
+        index = faiss.IndexFlatL2(dim)
+
+    index.add(vectors)
+    return configure_search(index)
+
+def stored_vectors(index):
+    """The exact vectors held by `index` (n x d), or None if it only keeps compressed codes."""
+    kind = index_kind(index)
+    if kind == "ivfpq":
+        return None
+    if kind == "ivf":
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def read_index(path, mmap=True):
+    """
+    Reads an index from disk, memory-mapped when FAISS supports it for the index type.
+    Returns (index, is_mmapped). A memory-mapped index is read-only.
+    """
+    if mmap:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return configure_search(faiss.read_index(path, flags)), True
+        except Exception as e:
+            print(f"Memory-mapped index load failed ({e}), reading into memory.")
+    return configure_search(faiss.read_index(path)), False
@@ -0,0 +1,77 @@
+import threading
+import time
+from overlay_ai.utils.config import AI_PROVIDER
+from overlay_ai.utils import metrics
+
+def _warm(name, func):
+    started = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        print(f"Warm-up of {name} failed: {e}")
+    metrics.record_timing(f"startup.warm.{name}", time.perf_counter() - started)
+
+def _warm_rag():
+    from overlay_ai.services.rag_service import get_rag_service
+    get_rag_service()
+
+def _warm_ocr():
+    from overlay_ai.services.ocr_service import warm_up
+    warm_up()
+
+def _warm_openai():
+    from overlay_ai.services.llm_service import get_openai_client
+    get_openai_client()
+
+def _warm_ollama():
+    from overlay_ai.services.llm_service import warm_ollama
+    warm_ollama()
+
+def start_background_warmup(on_model_status=None, on_done=None):
+    """
+    Builds the heavy services on a background thread once the window is up, so the
+    first question does not pay for imports, index loading or model loading.
+    `on_model_status(text)` reports local-model loading; `on_done()` fires when all is warm.
+    Both are called from the warm-up thread.
+    """
+    def _run():
+        if AI_PROVIDER == "llamacpp":
+            from overlay_ai.services.llm_service import preload_llama
+            if on_model_status:
+                on_model_status("Loading model...")
+            loader = preload_llama(
+                on_ready=lambda ok: on_model_status and on_model_status("Model ready" if ok else "Model failed to load")
+            )
+        elif AI_PROVIDER == "ollama":
+            # Ollama loads the model in its own process; this just waits for the ping
+            def _load():
+                if on_model_status:
+                    on_model_status("Loading model...")
+                ok = True
+                started = time.perf_counter()
+                try:
+                    _warm_ollama()
+                except Exception as e:
+                    print(f"Ollama warm-up failed: {e}")
+                    ok = False
+                metrics.record_timing("startup.warm.ollama", time.perf_counter() - started)
+                if on_model_status:
+                    on_model_status("Model ready" if ok else "Ollama not reachable")
+            loader = threading.Thread(target=_load, name="ollama-warmup", daemon=True)
+            loader.start()
+        else:
+            loader = None
+
+        if AI_PROVIDER == "openai":
+            _warm("openai", _warm_openai)
+        _warm("ocr", _warm_ocr)
+        _warm("rag", _warm_rag)
+
+        if loader is not None:
+            loader.join()
+        if on_done:
+            on_done()
+
+    thread = threading.Thread(target=_run, name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,302 @@
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView, QApplication, QStyle
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize, QTimer
+from PySide6.QtGui import QColor, QFont, QFontMetrics, QKeySequence
+from overlay_ai.ui.styles import COLORS
+
+IS_USER_ROLE = Qt.UserRole + 1
+
+# Bubble geometry, shared by every message
+BUBBLE_PADDING = 12
+BUBBLE_RADIUS = 10
+BUBBLE_SPACING = 5 # Above and below each bubble
+BUBBLE_WIDTH = 0.8 # Of the view width
+
+# View widths each message remembers its size for (e.g. docked and undocked)
+SIZE_CACHE_WIDTHS = 4
+# Rows laid out per event-loop pass; the rest are measured while the view is already usable
+LAYOUT_BATCH_SIZE = 50
+
+def _qcolor(css):
+    """QColor from the 'rgba(r, g, b, a)' / '#rrggbb' strings in COLORS."""
+    if css.startswith("rgba"):
+        r, g, b, a = [part.strip() for part in css[css.index("(") + 1:css.index(")")].split(",")]
+        return QColor(int(r), int(g), int(b), int(float(a) * 255))
+    return QColor(css)
+
+class ChatMessage:
+    """
+    One chat bubble. `seq` orders it within the model that created it: appended
+    messages count up and older pages loaded on top count down, so its row is
+    `seq` minus the model's first seq and prepending never touches existing messages.
+    """
+
+    __slots__ = ("text", "is_user", "seq", "size_cache")
+
+    def __init__(self, text, is_user, seq):
+        self.text = text
+        self.is_user = is_user
+        self.seq = seq
+        # View width -> QSize, oldest first, for the last SIZE_CACHE_WIDTHS widths;
+        # reset when the text changes
+        self.size_cache = None
+
+class ChatModel(QAbstractListModel):
+    """
+    List of messages; new ones are appended, text can be replaced in place (streaming,
+    QA revisions) and older pages of a saved session are prepended by `fetch_older`.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._messages = []
+        self._first_seq = 0
+        # Callable returning the next older page as [(text, is_user)], oldest first
+        self._load_older = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self._messages[index.row()]
+        if role == Qt.DisplayRole:
+            return message.text
+        if role == IS_USER_ROLE:
+            return message.is_user
+        return None
+
+    def message_at(self, row):
+        return self._messages[row]
+
+    def row_of(self, message):
+        return message.seq - self._first_seq
+
+    def append(self, text, is_user=False):
+        return self.extend([(text, is_user)])[0]
+
+    def extend(self, items):
+        """Appends [(text, is_user)] in one insertion and returns their messages."""
+        first = len(self._messages)
+        messages = [
+            ChatMessage(text, is_user, self._first_seq + first + i)
+            for i, (text, is_user) in enumerate(items)
+        ]
+        if messages:
+            self.beginInsertRows(QModelIndex(), first, first + len(messages) - 1)
+            self._messages.extend(messages)
+            self.endInsertRows()
+        return messages
+
+    def set_pager(self, load_older):
+        """Sets where `fetch_older` gets earlier messages from (None = nothing older)."""
+        self._load_older = load_older
+
+    def can_fetch_older(self):
+        return self._load_older is not None
+
+    def fetch_older(self):
+        """
+        Prepends the next older page and returns how many messages it had.
+        (Not Qt's fetchMore: views call that when scrolled to the bottom, where a
+        chat is usually parked, and it would pull in the whole session.)
+        """
+        if self._load_older is None:
+            return 0
+        items = self._load_older()
+        if not items:
+            self._load_older = None
+            return 0
+        first_seq = self._first_seq - len(items)
+        messages = [ChatMessage(text, is_user, first_seq + i) for i, (text, is_user) in enumerate(items)]
+        self.beginInsertRows(QModelIndex(), 0, len(messages) - 1)
+        self._messages[:0] = messages
+        self._first_seq = first_seq
+        self.endInsertRows()
+        return len(messages)
+
+    def contains(self, message):
+        row = self.row_of(message)
+        return 0 <= row < len(self._messages) and self._messages[row] is message
+
+    def set_text(self, message, text):
+        """Replaces a bubble's text. Returns False if the message was removed by `clear`."""
+        if not self.contains(message):
+            return False
+        if message.text != text:
+            message.text = text
+            message.size_cache = None
+            index = self.index(self.row_of(message))
+            self.dataChanged.emit(index, index, [Qt.DisplayRole])
+        return True
+
+    def clear(self):
+        self.beginResetModel()
+        # Seqs keep counting up so messages from before the reset never match a row again
+        self._first_seq += len(self._messages)
+        self._messages = []
+        self._load_older = None
+        self.endResetModel()
+
+class BubbleDelegate(QStyledItemDelegate):
+    """
+    Paints every message as a rounded bubble with one shared font and palette, and
+    measures it once per text and view width. Only rows in view are ever painted.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.font = QFont(QApplication.font())
+        self.font.setPixelSize(14)
+        self.metrics = QFontMetrics(self.font)
+        self.user_color = _qcolor(COLORS["user_msg_bg"])
+        self.ai_color = _qcolor(COLORS["ai_msg_bg"])
+        self.text_color = QColor(COLORS["text_primary"])
+        self.selected_color = _qcolor(COLORS["border"])
+
+    def _text_rect(self, view_width, text):
+        max_text_width = max(int(view_width * BUBBLE_WIDTH) - 2 * BUBBLE_PADDING, 1)
+        return self.metrics.boundingRect(QRect(0, 0, max_text_width, 1 << 20), Qt.TextWordWrap, text)
+
+    def _measure(self, message, view_width):
+        cache = message.size_cache
+        if cache is None:
+            cache = message.size_cache = {}
+        size = cache.get(view_width)
+        if size is not None:
+            return size
+        rect = self._text_rect(view_width, message.text)
+        size = QSize(view_width, rect.height() + 2 * BUBBLE_PADDING + 2 * BUBBLE_SPACING)
+        if len(cache) >= SIZE_CACHE_WIDTHS:
+            del cache[next(iter(cache))]
+        cache[view_width] = size
+        return size
+
+    def sizeHint(self, option, index):
+        message = index.model().message_at(index.row())
+        # Items span the viewport; wrapping depends only on its width
+        return self._measure(message, self.parent().viewport().width())
+
+    def paint(self, painter, option, index):
+        message = index.model().message_at(index.row())
+        text_rect = self._text_rect(option.rect.width(), message.text)
+        bubble_width = text_rect.width() + 2 * BUBBLE_PADDING
+        bubble_height = text_rect.height() + 2 * BUBBLE_PADDING
+        left = option.rect.right() - bubble_width if message.is_user else option.rect.left()
+        bubble = QRect(left, option.rect.top() + BUBBLE_SPACING, bubble_width, bubble_height)
+
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.user_color if message.is_user else self.ai_color)
+        painter.drawRoundedRect(bubble, BUBBLE_RADIUS, BUBBLE_RADIUS)
+        if option.state & QStyle.State_Selected:
+            painter.setBrush(self.selected_color)
+            painter.drawRoundedRect(bubble, BUBBLE_RADIUS, BUBBLE_RADIUS)
+        painter.setFont(self.font)
+        painter.setPen(self.text_color)
+        painter.drawText(
+            bubble.adjusted(BUBBLE_PADDING, BUBBLE_PADDING, -BUBBLE_PADDING, -BUBBLE_PADDING),
+            Qt.TextWordWrap, message.text
+        )
+        painter.restore()
+
+class ChatView(QListView):
+    """
+    Virtualized chat history: bubbles are painted by BubbleDelegate on demand
+    instead of being one widget each. Stays pinned to the newest message unless
+    the user has scrolled up. Ctrl+C copies the selected message.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.chat_model = ChatModel(self)
+        self.setModel(self.chat_model)
+        self.bubble_delegate = BubbleDelegate(self)
+        self.setItemDelegate(self.bubble_delegate)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        # Re-measure (from the per-message cache) when the width changes
+        self.setResizeMode(QListView.Adjust)
+        # Lay out a long session a batch at a time instead of sizing every row up front
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(LAYOUT_BATCH_SIZE)
+        self.setFrameShape(QListView.NoFrame)
+        self.setObjectName("ChatView")
+        self._pinned = True
+        # Scroll distance from the bottom to hold while prepended rows are laid out
+        # (in batches, so the range grows several times); dropped once the user scrolls
+        self._prepend_anchor = None
+        self._restoring = False
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.verticalScrollBar().rangeChanged.connect(self._on_range_changed)
+
+    def _on_scrolled(self, value):
+        if self._restoring:
+            return
+        self._prepend_anchor = None
+        maximum = self.verticalScrollBar().maximum()
+        self._pinned = value >= maximum - 4
+        if value == 0 and maximum > 0:
+            # Reached the top: load the previous page of the session
+            self.fetch_older()
+
+    def _on_range_changed(self, minimum, maximum):
+        if self._prepend_anchor is not None:
+            # Keep the same messages in view after older ones were added above them
+            self._restoring = True
+            self.verticalScrollBar().setValue(maximum - self._prepend_anchor)
+            self._restoring = False
+            return
+        # New or grown bubbles extend the range; follow them if we were at the bottom
+        if self._pinned:
+            self.verticalScrollBar().setValue(maximum)
+
+    def fetch_older(self):
+        if not self.chat_model.can_fetch_older():
+            return 0
+        scroll_bar = self.verticalScrollBar()
+        if not self._pinned:
+            self._prepend_anchor = scroll_bar.maximum() - scroll_bar.value()
+        added = self.chat_model.fetch_older()
+        if not added:
+            self._prepend_anchor = None
+        return added
+
+    def fill_viewport(self):
+        """Loads older pages until the view can scroll, so scrolling up can load the rest."""
+        if self.chat_model.can_fetch_older() and self.verticalScrollBar().maximum() == 0:
+            if self.fetch_older():
+                # The range is known once the new rows are laid out
+                QTimer.singleShot(0, self.fill_viewport)
+
+    def add_message(self, text, is_user=False):
+        # Rows below the view change now; hold the view where it is instead
+        self._prepend_anchor = None
+        return self.chat_model.append(text, is_user)
+
+    def set_text(self, message, text):
+        if not self.chat_model.set_text(message, text):
+            return False
+        self._prepend_anchor = None
+        # The height may have changed; the layout reads the new size from the delegate
+        self.bubble_delegate.sizeHintChanged.emit(self.chat_model.index(self.chat_model.row_of(message)))
+        return True
+
+    def clear(self):
+        self.chat_model.clear()
+        self._pinned = True
+        self._prepend_anchor = None
+
+    def scroll_to_bottom(self):
+        self._pinned = True
+        self.scrollToBottom()
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy) and self.currentIndex().isValid():
+            QApplication.clipboard().setText(self.currentIndex().data(Qt.DisplayRole))
+            event.accept()
+            return
+        super().keyPressEvent(event)
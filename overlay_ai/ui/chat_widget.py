@@ -1,12 +1,14 @@
 import time
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QTextEdit,
-    QPushButton, QScrollArea, QLabel, QFrame, QFileDialog, QSizePolicy, QApplication
+    QPushButton, QFileDialog, QSizePolicy, QApplication
 )
-from PySide6.QtCore import Signal, Qt
-from overlay_ai.ui.styles import COLORS
-from overlay_ai.services.capture_service import capture_screen
+from PySide6.QtCore import Signal, Qt, QTimer
+from overlay_ai.utils.config import STREAM_REPAINT_MS, CONVERSATION_STORE
+from overlay_ai.services.capture_service import capture_frame
+from overlay_ai.services.history_service import ConversationHistory
 from overlay_ai.ui.worker import AIWorker, IngestWorker
+from overlay_ai.ui.chat_view import ChatView
 
 class AutoResizingTextEdit(QTextEdit):
     return_pressed = Signal()
@@ -49,15 +51,9 @@ class ChatWidget(QWidget):
         self.layout.setContentsMargins(10, 10, 10, 10)
         self.layout.setSpacing(10)
 
-        # Chat History Area
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_content = QWidget()
-        self.scroll_layout = QVBoxLayout(self.scroll_content)
-        self.scroll_layout.setAlignment(Qt.AlignTop)
-        self.scroll_layout.setSpacing(10)
-        self.scroll_area.setWidget(self.scroll_content)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        # Chat History Area: one view painting all bubbles, not a widget per message
+        self.chat_view = ChatView()
+        self.chat_model = self.chat_view.chat_model
         
         # Input Area
         self.input_container = QWidget()
@@ -76,53 +72,149 @@ class ChatWidget(QWidget):
         self.send_btn.setObjectName("SendButton")
         self.send_btn.setFixedWidth(40)
         self.send_btn.clicked.connect(self.send_message)
+
+        # Shown while a question is being answered; sending another question also cancels it
+        self.cancel_btn = QPushButton("■")
+        self.cancel_btn.setObjectName("CancelButton")
+        self.cancel_btn.setFixedWidth(40)
+        self.cancel_btn.setToolTip("Stop this answer")
+        self.cancel_btn.clicked.connect(self.cancel_request)
+        self.cancel_btn.hide()
         
         self.input_layout.addWidget(self.upload_btn)
         self.input_layout.addWidget(self.input_field)
+        self.input_layout.addWidget(self.cancel_btn)
         self.input_layout.addWidget(self.send_btn)
 
-        self.layout.addWidget(self.scroll_area)
+        self.layout.addWidget(self.chat_view)
         self.layout.addWidget(self.input_container)
         
+        # The request still waiting for its answer
         self.worker = None
         self.ingest_worker = None
-        self.history = []
+        self._ingest_bubble = None
+        self.history = ConversationHistory()
+        # Workers that answered (or were cancelled) but are still running, e.g. verifying
+        # in the background. Kept referenced until their pool thread is done with them.
+        self._background_workers = []
+
+        # Streaming state: the assistant bubble being filled and the text received so far.
+        # Repaints are coalesced through a single-shot timer instead of one per token.
+        self._stream_bubble = None
+        self._stream_text = ""
+        self._stream_timer = QTimer(self)
+        self._stream_timer.setSingleShot(True)
+        self._stream_timer.setInterval(STREAM_REPAINT_MS)
+        self._stream_timer.timeout.connect(self._flush_stream)
+
+        # Saved conversation: reopens the last session, lazily starts a new one
+        self.store = None
+        self.session_id = None
+        if CONVERSATION_STORE:
+            from overlay_ai.services.conversation_store import conversation_store
+            self.store = conversation_store
+            try:
+                self._restore_session()
+            except Exception as e:
+                print(f"Could not reopen the last conversation: {e}")
+
+    def _restore_session(self):
+        session_id = self.store.last_session()
+        if session_id is None:
+            return
+        rows = self.store.page(session_id)
+        self.session_id = session_id
+        if not rows:
+            return
+        self.chat_model.extend([(row["content"], row["role"] == "user") for row in rows])
+        self.history.restore([(row["role"], row["content"]) for row in rows])
+
+        oldest = [rows[0]["id"]]
+
+        def load_older():
+            page = self.store.page(session_id, before_id=oldest[0])
+            if page:
+                oldest[0] = page[0]["id"]
+            return [(row["content"], row["role"] == "user") for row in page]
+
+        self.chat_model.set_pager(load_older)
+        QTimer.singleShot(0, self.chat_view.fill_viewport)
+
+    def _save(self, role, content):
+        """Queues a turn for the conversation store; returns its handle for `store.update`."""
+        if self.store is None:
+            return None
+        if self.session_id is None:
+            self.session_id = self.store.start_session()
+        if role == "user":
+            # The first question names the session
+            self.store.set_title(self.session_id, content)
+        return self.store.append(self.session_id, role, content)
+
+    def show_search(self, text):
+        if self.store is None:
+            self.add_message("Conversation history is not saved (CONVERSATION_STORE=false).", is_user=False)
+            return
+        results = self.store.search(text)
+        if not results:
+            self.add_message(f"No saved messages match \"{text}\".", is_user=False)
+            return
+        lines = [f"Saved messages matching \"{text}\":"]
+        for result in results:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(result["created_at"]))
+            who = "You" if result["role"] == "user" else "Assistant"
+            lines.append(f"{when} {who}: {result['snippet']}")
+        self.add_message("\n\n".join(lines), is_user=False)
 
     def upload_manual(self):
         fname, _ = QFileDialog.getOpenFileName(self, "Open User Manual", "", "Documents (*.pdf *.txt *.docx)")
         if fname:
-            self.add_message(f"Uploading and processing {fname}...", is_user=False)
+            self._ingest_bubble = self.add_message(f"Uploading and processing {fname}...", is_user=False)
             self.ingest_worker = IngestWorker(fname)
+            self.ingest_worker.progress.connect(self.on_ingest_progress)
             self.ingest_worker.finished.connect(self.on_ingest_finished)
             self.ingest_worker.start()
 
+    def on_ingest_progress(self, stage, done, total, rate):
+        label = "Reading pages" if stage == "pages" else "Captioning images"
+        unit = "pages/s" if stage == "pages" else "images/s"
+        if self._ingest_bubble is not None:
+            # Ignored if the bubble was removed by clear_history
+            self.chat_view.set_text(self._ingest_bubble, f"{label}: {done}/{total} ({rate:.1f} {unit})")
+
     def on_ingest_finished(self, result):
+        self._ingest_bubble = None
         self.add_message(result, is_user=False)
     
     def clear_history(self):
-        self.history = []
-        # Remove all items from layout
-        while self.scroll_layout.count():
-            item = self.scroll_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
+        self.cancel_request(announce=False)
+        self.history.clear()
+        self.chat_view.clear()
+        # The old session stays on disk. The new one is written right away so it is
+        # the latest on the next start, even if nothing is asked before quitting.
+        if self.store is not None:
+            self.session_id = self.store.start_session()
         self.add_message("History cleared.", is_user=False)
 
     def send_message(self):
         text = self.input_field.toPlainText().strip()
+        if text.startswith("/search "):
+            self.input_field.clear()
+            self.show_search(text[len("/search "):].strip())
+            return
         if text:
-            # 1. Update UI and History with User Message
+            # 1. Update UI and History with User Message.
+            # The worker gets the turns before this one; the question itself goes in the prompt.
             self.add_message(text, is_user=True)
-            self.history.append({"role": "user", "content": text})
-            
-            # Limit history
-            if len(self.history) > 10:
-                self.history = self.history[-10:]
+            history = self.history.messages()
+            self.history.append("user", text)
+            self._save("user", text)
+
+            # Asking something else abandons the question still being answered
+            self.cancel_request(announce=False)
 
             self.message_sent.emit(text)
             self.input_field.clear()
-            self.input_field.setDisabled(True)
             self.show_loading()
             
             # --- Smart Capture Logic ---
@@ -146,7 +238,7 @@ class ChatWidget(QWidget):
                 time.sleep(0.2)
                 
                 try:
-                    image = capture_screen()
+                    image = capture_frame()
                 except Exception as e:
                     print(f"Capture failed: {e}")
                 
@@ -155,60 +247,102 @@ class ChatWidget(QWidget):
             # ---------------------------
             
             # Start Worker
-            self.worker = AIWorker(text, self.history, image=image)
+            self.worker = AIWorker(text, history, image=image)
+            self.worker.chunk.connect(self.on_worker_chunk)
             self.worker.finished.connect(self.on_worker_finished)
+            self.worker.revised.connect(self.on_worker_revised)
             self.worker.start()
+            self._set_busy(True)
+
+    def _set_busy(self, busy):
+        self.cancel_btn.setVisible(busy)
+
+    def _release_worker(self):
+        """Stops treating the current request as pending; keeps it referenced while it runs."""
+        self._background_workers = [w for w in self._background_workers if w.is_running()]
+        if self.worker is not None and self.worker.is_running():
+            self._background_workers.append(self.worker)
+        self.worker = None
+        self._set_busy(False)
+
+    def cancel_request(self, announce=True):
+        """Abandons the question being answered. Late chunks and answers from it are ignored."""
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        self._release_worker()
+        self._stream_timer.stop()
+        if self._stream_bubble is not None:
+            self.chat_view.set_text(self._stream_bubble, f"{self._stream_text}\n\n[Cancelled]")
+            self._stream_bubble = None
+            self._stream_text = ""
+        elif announce:
+            self.add_message("[Cancelled]", is_user=False)
+        self.input_field.setFocus()
+
+    def on_worker_chunk(self, text):
+        if self.sender() is not self.worker:
+            # From a request that was cancelled or replaced
+            return
+        if self._stream_bubble is None:
+            self._stream_bubble = self.add_message(text, is_user=False)
+            self._stream_text = text
+            return
+        self._stream_text += text
+        if not self._stream_timer.isActive():
+            self._stream_timer.start()
+
+    def _flush_stream(self):
+        if self._stream_bubble is not None:
+            self.chat_view.set_text(self._stream_bubble, self._stream_text)
 
     def on_worker_finished(self, response):
         # 2. Update UI and History with Assistant Response
-        self.add_message(response, is_user=False)
-        self.history.append({"role": "assistant", "content": response})
+        worker = self.sender()
+        if worker is not self.worker:
+            return
+        shown = response
+        if getattr(worker, "from_cache", False):
+            shown = f"{response}\n\n[Answered from cache]"
+        if self._stream_bubble is not None:
+            # The final text may differ from the streamed draft (e.g. QA retry)
+            self._stream_timer.stop()
+            bubble = self._stream_bubble
+            self.chat_view.set_text(bubble, shown)
+            self._stream_bubble = None
+            self._stream_text = ""
+        else:
+            bubble = self.add_message(shown, is_user=False)
+        entry = self.history.append("assistant", response)
+        worker.saved_message = self._save("assistant", response)
+
+        # Remember where this answer lives in case background QA revises it
+        worker.answer_bubble = bubble
+        worker.history_entry = entry
+        self._release_worker()
         
-        self.input_field.setDisabled(False)
         self.input_field.setFocus()
 
+    def on_worker_revised(self, response):
+        worker = self.sender()
+        bubble = getattr(worker, "answer_bubble", None)
+        entry = getattr(worker, "history_entry", None)
+        if entry is not None:
+            entry["content"] = response
+        saved = getattr(worker, "saved_message", None)
+        if saved is not None:
+            self.store.update(saved, response)
+        if bubble is not None:
+            # Ignored if the bubble was removed by clear_history
+            self.chat_view.set_text(bubble, response)
+
     def add_message(self, text, is_user=False):
-        bubble = QLabel(text)
-        bubble.setWordWrap(True)
-        bubble.setTextInteractionFlags(Qt.TextSelectableByMouse)
-        
-        # Style logic
-        bg_color = COLORS['user_msg_bg'] if is_user else COLORS['ai_msg_bg']
-        align = Qt.AlignRight if is_user else Qt.AlignLeft
-        
-        bubble.setStyleSheet(f"""
-            QLabel {{
-                background-color: {bg_color};
-                color: white;
-                border-radius: 10px;
-                padding: 12px;
-                font-size: 14px;
-                line-height: 1.4;
-            }}
-        """)
-        
-        # Adjust size policy to ensure it grows vertically
-        from PySide6.QtWidgets import QSizePolicy
-        bubble.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Minimum)
-        # Limit maximum width to 80% of scroll area to look like a proper chat bubble
-        # This helps with wrapping
-        bubble.setMaximumWidth(int(self.scroll_area.width() * 0.8))
-
-        # Container to handle alignment
-        container = QWidget()
-        c_layout = QHBoxLayout(container)
-        c_layout.setContentsMargins(0, 5, 0, 5) # Add vertical spacing between bubbles
-        c_layout.setAlignment(align)
-        c_layout.addWidget(bubble)
-        
-        self.scroll_layout.addWidget(container)
-        
-        # Auto-scroll to bottom
-        # Use simple timer to wait for layout update or process events
-        from PySide6.QtCore import QTimer
-        QTimer.singleShot(100, lambda: self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum()
-        ))
+        """Appends a bubble and returns its handle for later `chat_view.set_text` calls."""
+        message = self.chat_view.add_message(text, is_user)
+        if is_user:
+            # Sending a message jumps back to the newest one even if scrolled up
+            self.chat_view.scroll_to_bottom()
+        return message
 
     def show_loading(self):
         # We could add a temporary widget/label here
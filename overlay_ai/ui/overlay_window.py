@@ -15,6 +15,9 @@ class DraggableHeader(QWidget):
         
         self.title = QLabel("Overlay AI")
         self.title.setStyleSheet("font-weight: bold; color: white;")
+
+        self.status = QLabel("")
+        self.status.setObjectName("HeaderStatus")
         
         self.collapse_btn = QPushButton("-")
         self.collapse_btn.setObjectName("HeaderButton")
@@ -25,6 +28,7 @@ class DraggableHeader(QWidget):
         self.close_btn.setFixedWidth(30)
         
         self.layout.addWidget(self.title)
+        self.layout.addWidget(self.status)
         self.layout.addStretch()
         self.layout.addWidget(self.collapse_btn)
         self.layout.addWidget(self.close_btn)
@@ -93,6 +97,9 @@ class OverlayWindow(QMainWindow):
         self.is_collapsed = False
         self.expanded_height = 600
 
+    def set_status(self, text):
+        self.header.status.setText(text)
+
     def add_content(self, widget):
         self.content_layout.addWidget(widget)
 
@@ -35,6 +35,10 @@ QScrollArea {{
 QScrollArea > QWidget > QWidget {{
     background: transparent;
 }}
+QListView#ChatView {{
+    background: transparent;
+    border: none;
+}}
 
 /* Input Field */
 /* Input Field */
@@ -61,6 +65,11 @@ QPushButton#SendButton {{
 QPushButton#SendButton:hover {{
     background-color: {COLORS['accent_hover']};
 }}
+QPushButton#CancelButton {{
+    border-radius: 8px;
+    color: white;
+    padding: 6px 12px;
+}}
 
 /* Scrollbar */
 QScrollBar:vertical {{
@@ -85,6 +94,11 @@ QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
     border-top-right-radius: 12px;
 }}
 
+QLabel#HeaderStatus {{
+    color: {COLORS['text_secondary']};
+    font-size: 12px;
+}}
+
 QPushButton#HeaderButton {{
     background: transparent;
     border: none;
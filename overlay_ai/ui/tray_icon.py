@@ -18,6 +18,10 @@ class SystemTray(QSystemTrayIcon):
 
         # Menu
         self.menu = QMenu()
+        self.status_action = self.menu.addAction("")
+        self.status_action.setEnabled(False)
+        self.status_action.setVisible(False)
+
         self.toggle_action = self.menu.addAction("Toggle Overlay")
         self.toggle_action.triggered.connect(self.toggle_requested.emit)
         
@@ -32,6 +36,11 @@ class SystemTray(QSystemTrayIcon):
         # Click handler
         self.activated.connect(self.on_activated)
 
+    def set_model_status(self, text):
+        self.setToolTip(f"Overlay AI Assistant - {text}")
+        self.status_action.setText(text)
+        self.status_action.setVisible(True)
+
     def on_activated(self, reason):
         if reason == QSystemTrayIcon.Trigger:
             self.toggle_requested.emit()
@@ -1,48 +1,294 @@
-from PySide6.QtCore import QThread, Signal
-from overlay_ai.services.capture_service import capture_screen
+import threading
+import time
+from PySide6.QtCore import QObject, QThread, QThreadPool, Signal
 from overlay_ai.services.ocr_service import extract_text
-from overlay_ai.services.llm_service import query_assistant
-from overlay_ai.services.rag_service import rag_service
+from overlay_ai.services.llm_service import (
+    query_assistant_raw, revise_if_rejected, cached_answer, cache_answer, user_request
+)
+from overlay_ai.services.frame_cache import frame_cache
+from overlay_ai.services.encoding_service import payloads_for, share_payloads, encode_for_provider
+from overlay_ai.services.context_service import assemble_context
+from overlay_ai.utils.config import (
+    STREAM_RESPONSES, VERIFY_MODE, RESPONSE_CACHE, REQUEST_WORKERS, OCR_TIMEOUT, RETRIEVAL_TIMEOUT, LLM_TIMEOUT
+)
+from overlay_ai.utils.cancellation import CancelToken, RequestCancelled, StageTimeout, run_stage, start_stage
+from overlay_ai.utils import metrics
 
-class AIWorker(QThread):
+_request_pool = None
+
+def request_pool():
+    """Bounded pool of reused threads that run chat requests."""
+    global _request_pool
+    if _request_pool is None:
+        _request_pool = QThreadPool()
+        _request_pool.setMaxThreadCount(REQUEST_WORKERS)
+    return _request_pool
+
+class AIWorker(QObject):
+    """
+    One chat request, run on `request_pool()`. Every stage has a timeout, and
+    `cancel()` abandons the request: waiting stops at once and a streaming
+    provider call is closed at its next chunk.
+    """
     finished = Signal(str)
+    chunk = Signal(str)
+    revised = Signal(str) # Background QA rejected the answer emitted by `finished`
 
-    def __init__(self, user_text, history=None, image=None):
+    def __init__(self, user_text, history=None, image=None, stream=STREAM_RESPONSES, verify_mode=VERIFY_MODE):
         super().__init__()
         self.user_text = user_text
-        self.history = history or []
+        # Snapshot: in background mode the chat keeps appending while we verify
+        self.history = list(history or [])
         self.image = image
+        self.stream = stream
+        self.verify_mode = verify_mode
+        self.token = CancelToken()
+        self._running = threading.Event()
+        self._started_at = None
+        self._first_chunk_seen = False
+        self._streamed = []
+        # perf_counter() of the latest streamed chunk; a streamed call times out on silence
+        self._last_chunk_at = None
+        # Set when `finished` carries an answer from the response cache
+        self.from_cache = False
+        # (chunks, question vector) the answer is cached under; None when not cacheable
+        self._cache_key = None
+        # Provider that wrote the answer being shown (the draft, or the QA revision)
+        self._answered_by = None
+
+    def start(self):
+        self._running.set()
+        request_pool().start(self.run)
+
+    def is_running(self):
+        return self._running.is_set()
+
+    def cancel(self):
+        self.token.cancel()
+
+    @property
+    def cancelled(self):
+        return self.token.cancelled
+
+    def _emit_chunk(self, text):
+        # Runs on the provider's stream; raising here closes the stream
+        self.token.check()
+        self._last_chunk_at = time.perf_counter()
+        if not self._first_chunk_seen:
+            self._first_chunk_seen = True
+            metrics.record_timing("llm.time_to_first_token", time.perf_counter() - self._started_at)
+        self._streamed.append(text)
+        self.chunk.emit(text)
 
     def run(self):
+        self._started_at = time.perf_counter()
+        self._first_chunk_seen = False
+        self._last_chunk_at = None
         try:
-            # 1. Image & OCR (Only if provided)
-            image = self.image
-            text_context = ""
-            
-            if image:
-                # 2. OCR
-                text_context = extract_text(image)
-            
-            # 3. RAG Retrieval
-            manual_context = rag_service.retrieve(self.user_text)
-            
-            # 4. Query LLM
-            response = query_assistant(self.user_text, image, text_context, manual_context, self.history)
-            
-            self.finished.emit(response)
+            with user_request():
+                self._answer()
+        except RequestCancelled:
+            metrics.increment("requests.cancelled")
+        except StageTimeout as e:
+            # Keep whatever was streamed before the model stalled
+            partial = "".join(self._streamed)
+            if partial:
+                self.finished.emit(f"{partial}\n\n[Stopped: {e}]")
+            else:
+                self.finished.emit(f"Error: {e}.")
         except Exception as e:
             self.finished.emit(f"Error processing request: {e}")
+        finally:
+            self._running.clear()
+
+    def _answer(self):
+        image = self.image
+        text_context, chunks = self._prepare(image)
+
+        # Text-only questions may already have an answer for this context
+        if RESPONSE_CACHE and image is None:
+            from overlay_ai.services.rag_service import get_rag_service
+            rag_service = get_rag_service()
+            # Retrieval just embedded the question, so this is normally an LRU hit
+            question_vector = rag_service.embed_query(self.user_text)
+            answer = cached_answer(self.user_text, chunks, question_vector, history=self.history)
+            if answer is not None:
+                self.from_cache = True
+                metrics.record_timing("llm.time_to_full_response", time.perf_counter() - self._started_at)
+                self.token.check()
+                self.finished.emit(answer)
+                return
+            self._cache_key = (chunks, question_vector)
+
+        # Fit OCR, manual chunks and history into the provider's token budget
+        text_context, manual_context, history = assemble_context(
+            self.user_text, text_context, chunks, self.history, has_image=image is not None
+        )
+
+        # Query LLM. A streamed answer may take as long as it keeps producing chunks;
+        # LLM_TIMEOUT then limits the silence before the first and between chunks.
+        on_chunk = self._emit_chunk if self.stream else None
+        progress = (lambda: self._last_chunk_at) if self.stream else None
+        started = time.perf_counter()
+        draft = run_stage(
+            "generate",
+            lambda: query_assistant_raw(
+                self.user_text, image, text_context, manual_context, history,
+                on_chunk=on_chunk, on_provider=self._set_answered_by
+            ),
+            LLM_TIMEOUT, self.token, cancel_on_timeout=True, progress=progress
+        )
+        mode = self.verify_mode
+        if mode == "off":
+            metrics.record_timing("verify.off.latency", time.perf_counter() - started)
+            self._finish(draft)
+            return
+
+        if mode == "background":
+            # Show the draft right away, then QA it while the user is already reading
+            metrics.record_timing("verify.background.latency", time.perf_counter() - started)
+            self._finish(draft)
+            try:
+                revised = self._verify(draft, image, text_context, manual_context, history)
+            except (RequestCancelled, StageTimeout) as e:
+                print(f"Background verification abandoned: {e}")
+                return
+            except Exception as e:
+                print(f"Background verification error: {e}")
+                return
+            metrics.record_timing("verify.background.total", time.perf_counter() - started)
+            if revised:
+                self.revised.emit(revised)
+            self._remember(revised or draft)
+            return
+
+        # 'blocking': QA before showing; a QA pass that hangs does not cost the draft
+        try:
+            revised = self._verify(draft, image, text_context, manual_context, history)
+        except StageTimeout as e:
+            print(f"Verification skipped: {e}")
+            revised = None
+        metrics.record_timing("verify.blocking.latency", time.perf_counter() - started)
+        self._finish(revised or draft)
+
+    def _prepare(self, image):
+        """
+        Runs the stages the prompt depends on as a small graph:
+
+            ocr ────────┐
+            retrieval ──┼─> assemble_context -> generate
+            encode ─────┘
+
+        The three inputs do not depend on each other, so they run at the same time.
+        Encoding only warms the per-image payload memo; the provider call picks it up.
+        Returns (ocr_text, chunk texts).
+        """
+        started = time.perf_counter()
+        stages = []
+        retrieval = start_stage("retrieval", self._retrieve, self.token)
+        stages.append(retrieval)
+        ocr = None
+        text_context = ""
+        if image:
+            # A screen seen recently brings its OCR text and encoded payloads along;
+            # looked up first so the encode stage below can reuse those payloads.
+            signature, cached = frame_cache.lookup(image) if frame_cache.enabled else (None, None)
+            if cached is not None:
+                share_payloads(image, cached.payloads)
+                text_context = cached.ocr_text
+            else:
+                ocr = start_stage("ocr", lambda: self._ocr(image, signature), self.token)
+                stages.append(ocr)
+            encode = start_stage("encode", lambda: encode_for_provider(image), self.token)
+            stages.append(encode)
+
+        if ocr is not None:
+            try:
+                text_context = ocr.result(OCR_TIMEOUT, self.token)
+            except StageTimeout as e:
+                # The model still gets the screenshot itself
+                print(f"Skipping OCR: {e}")
+        try:
+            docs = retrieval.result(RETRIEVAL_TIMEOUT, self.token)
+        except StageTimeout as e:
+            print(f"Skipping manual context: {e}")
+            docs = []
+        if image:
+            try:
+                encode.result(OCR_TIMEOUT, self.token)
+            except RequestCancelled:
+                raise
+            except Exception as e:
+                # The provider call encodes the image itself
+                print(f"Image pre-encoding failed: {e}")
+
+        elapsed = time.perf_counter() - started
+        metrics.record_timing("stage.prepare", elapsed)
+        sequential = sum(stage.duration for stage in stages if stage.duration is not None)
+        # What running the stages one after another would have cost on top
+        metrics.record_timing("stage.prepare_saved", max(sequential - elapsed, 0.0))
+        return text_context, [d.page_content for d in docs]
+
+    def _retrieve(self):
+        from overlay_ai.services.rag_service import get_rag_service
+        return get_rag_service().retrieve_documents(self.user_text)
+
+    def _verify(self, draft, image, text_context, manual_context, history):
+        # Up to two non-streamed calls: the critique and the regenerated answer
+        return run_stage(
+            "verify",
+            lambda: revise_if_rejected(
+                self.user_text, draft, image, text_context, manual_context, history,
+                on_provider=self._set_answered_by
+            ),
+            2 * LLM_TIMEOUT, self.token
+        )
+
+    def _finish(self, answer):
+        self.token.check()
+        metrics.record_timing("llm.time_to_full_response", time.perf_counter() - self._started_at)
+        self.finished.emit(answer)
+        if self.verify_mode != "background":
+            self._remember(answer)
+
+    def _set_answered_by(self, provider):
+        self._answered_by = provider
+
+    def _remember(self, answer):
+        if self._cache_key is not None:
+            chunks, question_vector = self._cache_key
+            cache_answer(self.user_text, chunks, answer, question_vector, provider=self._answered_by, history=self.history)
+
+    def _ocr(self, image, signature):
+        text_context = extract_text(image)
+        if signature is not None:
+            # The payload dict is filled in by the encode stage and the provider call
+            frame_cache.store(signature, text_context, payloads_for(image))
+        return text_context
 
 class IngestWorker(QThread):
     finished = Signal(str)
+    progress = Signal(str, int, int, float) # stage, done, total, items per second
     
     def __init__(self, file_path):
         super().__init__()
         self.file_path = file_path
+        self._stage_started = {}
+
+    def _report_progress(self, stage, done, total):
+        if stage == "pages":
+            # Captioning starts as soon as the first batch of pages is in
+            self._stage_started.setdefault("images", time.perf_counter())
+        started = self._stage_started.setdefault(stage, time.perf_counter())
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.progress.emit(stage, done, total, rate)
         
     def run(self):
         try:
-            result = rag_service.ingest_file(self.file_path)
+            self._stage_started = {"pages": time.perf_counter()}
+            from overlay_ai.services.rag_service import get_rag_service
+            result = get_rag_service().ingest_file(self.file_path, progress=self._report_progress)
             self.finished.emit(result)
         except Exception as e:
             self.finished.emit(f"Ingestion failed: {e}")
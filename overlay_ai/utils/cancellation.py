@@ -0,0 +1,119 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from overlay_ai.utils.config import REQUEST_WORKERS
+from overlay_ai.utils import metrics
+
+# How often a waiting request checks whether it was cancelled
+POLL_INTERVAL = 0.05
+# Most stages one request has on the pool at once (retrieval, OCR, encode), plus one
+# abandoned after a timeout that still holds its thread
+STAGES_PER_REQUEST = 4
+
+class RequestCancelled(Exception):
+    """The user abandoned the request."""
+
+class StageTimeout(Exception):
+    def __init__(self, stage, timeout, stalled=False):
+        if stalled:
+            super().__init__(f"{stage} made no progress for {timeout:g}s")
+        else:
+            super().__init__(f"{stage} did not finish within {timeout:g}s")
+        self.stage = stage
+        self.timeout = timeout
+
+class CancelToken:
+    """Shared flag between the UI and every stage of one request."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Raises RequestCancelled once the request was cancelled. Safe to call from any thread."""
+        if self._event.is_set():
+            raise RequestCancelled()
+
+# Stages run here so the request thread can stop waiting for one that hangs.
+# An abandoned stage keeps its thread until its call returns, so the pool is sized
+# for every request running its stages at once. Timeouts start when a stage does,
+# so a stage queued behind other requests' is not charged for the wait.
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=REQUEST_WORKERS * STAGES_PER_REQUEST, thread_name_prefix="stage"
+            )
+        return _executor
+
+class Stage:
+    """A unit of request work running on the stage pool; see `start_stage`."""
+
+    def __init__(self, name, func):
+        self.name = name
+        # Time the stage itself ran, set once it finishes (excludes queueing and waiting)
+        self.duration = None
+        # perf_counter() when a pool thread picked the stage up
+        self.started_at = None
+        self.future = _get_executor().submit(self._run, func)
+
+    def _run(self, func):
+        self.started_at = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.duration = time.perf_counter() - self.started_at
+            metrics.record_timing(f"stage.{self.name}", self.duration)
+
+    def result(self, timeout, token, cancel_on_timeout=False, progress=None):
+        """
+        Waits until the stage has run for `timeout` seconds (0 = no limit; time spent
+        queued does not count) and returns its result. With `progress`, a callable
+        returning the perf_counter() time of the stage's latest progress (or None),
+        the stage only times out after `timeout` seconds without progress.
+        Raises RequestCancelled as soon as `token` is cancelled and StageTimeout when
+        the stage is too slow; either way the stage is left to finish on its own and
+        its result is discarded. With `cancel_on_timeout` a timeout also cancels
+        `token`, so a streaming call stops at its next chunk.
+        """
+        while True:
+            deadline = self._deadline(timeout, progress)
+            wait = POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, max(deadline - time.perf_counter(), 0))
+            try:
+                return self.future.result(timeout=wait)
+            except FutureTimeout:
+                pass
+            token.check()
+            if deadline is not None and time.perf_counter() >= deadline:
+                metrics.increment(f"stage.{self.name}.timeouts")
+                if cancel_on_timeout:
+                    token.cancel()
+                raise StageTimeout(self.name, timeout, stalled=progress is not None)
+
+    def _deadline(self, timeout, progress):
+        started = self.started_at
+        if timeout <= 0 or started is None:
+            return None
+        latest = progress() if progress is not None else None
+        return max(started, latest or started) + timeout
+
+def start_stage(name, func, token):
+    """Starts `func()` on the stage pool without waiting, so independent stages overlap."""
+    token.check()
+    return Stage(name, func)
+
+def run_stage(name, func, timeout, token, cancel_on_timeout=False, progress=None):
+    """Runs `func()` as a stage and waits for it; see `Stage.result`."""
+    return start_stage(name, func, token).result(timeout, token, cancel_on_timeout, progress)
@@ -12,12 +12,100 @@ if not OPENAI_API_KEY:
     print("Warning: OPENAI_API_KEY not found in environment.")
 
 AI_PROVIDER = os.getenv("AI_PROVIDER", "openai").lower() # 'openai' or 'ollama'
+# Providers tried, in order, when the one before them fails, e.g. "ollama,openai"
+AI_FALLBACK_PROVIDERS = [p.strip().lower() for p in os.getenv("AI_FALLBACK_PROVIDERS", "").split(",") if p.strip()]
+AI_PROVIDERS = list(dict.fromkeys([AI_PROVIDER] + AI_FALLBACK_PROVIDERS))
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "0")) # Seconds without output before the next provider is also asked, 0 = never
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "3")) # Failures in a row before a provider is skipped
+CIRCUIT_RESET = float(os.getenv("CIRCUIT_RESET", "30")) # Seconds a failing provider is skipped before it is tried again
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llava")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120")) # Seconds to wait for an Ollama response
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5")) # Seconds to wait for the Ollama server to accept a connection
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m") # How long Ollama keeps the model loaded after a request, -1 = forever
 
 # Llama.cpp Config
 LLAMA_MODEL_PATH = os.getenv("LLAMA_MODEL_PATH", "") # Path to .gguf file
 LLAMA_CLIP_PATH = os.getenv("LLAMA_CLIP_PATH", "") # Path to mmproj .gguf (required for vision)
 LLAMA_N_GPU_LAYERS = int(os.getenv("LLAMA_N_GPU_LAYERS", "0")) # -1 for all
+LLAMA_N_CTX = int(os.getenv("LLAMA_N_CTX", "2048")) # Context window; the prompt budget is derived from it
+LLAMA_IMAGE_TOKENS = int(os.getenv("LLAMA_IMAGE_TOKENS", "576")) # Context an image embedding takes (576 for LLaVA 1.5)
 
 TESSERACT_CMD = os.getenv("TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto").lower() # 'auto', 'tesserocr' (in-process) or 'pytesseract' (subprocess)
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+# tessdata folder for the in-process engine; defaults to the one next to TESSERACT_CMD
+TESSDATA_PATH = os.getenv("TESSDATA_PATH") or (
+    os.path.join(os.path.dirname(TESSERACT_CMD), "tessdata")
+    if os.path.isdir(os.path.join(os.path.dirname(TESSERACT_CMD), "tessdata")) else ""
+)
+OCR_MODE = os.getenv("OCR_MODE", "auto").lower() # 'full', 'tiled' or 'auto' (tiled for large screens)
+OCR_TILE_SIZE = int(os.getenv("OCR_TILE_SIZE", "1024")) # Tile edge in pixels
+OCR_TILE_OVERLAP = int(os.getenv("OCR_TILE_OVERLAP", "64")) # Extra margin so words on a seam are read whole
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 4))) # Tiles OCR'd in parallel
+
+# Prompt size
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000")) # Max tokens of question + OCR + manual + history per request
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200")) # Recent turns kept verbatim; older ones are summarized
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "300")) # Max size of the running summary, 0 = drop old turns instead
+
+# Streaming
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true" # Show tokens as they arrive
+STREAM_REPAINT_MS = int(os.getenv("STREAM_REPAINT_MS", "50")) # Coalesce bubble repaints to this interval
+
+# Request execution
+REQUEST_WORKERS = int(os.getenv("REQUEST_WORKERS", "3")) # Chat requests (incl. background QA) running at once
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "15")) # Seconds before answering without screen text
+RETRIEVAL_TIMEOUT = float(os.getenv("RETRIEVAL_TIMEOUT", "5")) # Seconds before answering without manual context
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120")) # Seconds a model call may take (streamed: between chunks), 0 = no limit
+
+# Answer verification: 'off', 'background' (show draft, QA in parallel) or 'blocking' (QA before showing)
+VERIFY_MODE = os.getenv("VERIFY_MODE", "background").lower()
+
+# Screenshot encoding for vision requests
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1600")) # Longest edge sent to the model, 0 = full resolution
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "auto").upper() # 'auto' (per provider), 'PNG', 'JPEG' or 'WEBP'
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85")) # JPEG/WebP quality
+
+# Screen capture
+CAPTURE_MONITOR = int(os.getenv("CAPTURE_MONITOR", "1")) # 1 = primary, 2..n = others, 0 = all monitors combined
+
+# Repeat-screen cache (skips OCR and re-encoding when the screen did not change)
+FRAME_CACHE_SIZE = int(os.getenv("FRAME_CACHE_SIZE", "8")) # Screens remembered, 0 disables
+FRAME_CACHE_TOLERANCE = int(os.getenv("FRAME_CACHE_TOLERANCE", "2")) # Per-cell brightness noise to ignore (0-255) when FRAME_CACHE_MAX_CHANGED > 0
+FRAME_CACHE_MAX_CHANGED = float(os.getenv("FRAME_CACHE_MAX_CHANGED", "0")) # Fraction of changed cells still counted as the same screen, 0 = identical pixels only
+
+# Manual ingestion
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 4))) # Processes extracting PDF pages
+CAPTION_CONCURRENCY = int(os.getenv("CAPTION_CONCURRENCY", "4")) # Image captioning requests in flight
+
+# Image caption cache (captions are reused across pages, files and re-ingests)
+CAPTION_CACHE_PATH = os.getenv("CAPTION_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "services", "manual_store", "caption_cache.sqlite3"))
+CAPTION_CACHE_SIZE = int(os.getenv("CAPTION_CACHE_SIZE", "5000")) # Max cached captions (least recently used evicted)
+CAPTION_CACHE_MAX_DISTANCE = int(os.getenv("CAPTION_CACHE_MAX_DISTANCE", "0")) # Difference-hash bits for a near-duplicate match (opt-in), 0 = exact content only
+
+# Response cache for repeated text-only questions
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() == "true"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "services", "manual_store", "response_cache.sqlite3"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000")) # Max cached answers (least recently used evicted)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600))) # Seconds an answer stays valid, 0 = forever
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95")) # Cosine similarity for a differently worded match, 1 = exact only
+
+# Conversation history on disk
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "true").lower() == "true" # Keep chat sessions across restarts
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "services", "manual_store", "conversations.sqlite3"))
+CONVERSATION_PAGE_SIZE = int(os.getenv("CONVERSATION_PAGE_SIZE", "50")) # Messages loaded at a time when scrolling back
+
+# Manual vector index
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat").lower() # 'flat' (exact), 'ivf', 'hnsw' or 'ivfpq' (compressed)
+RAG_IVF_NLIST = int(os.getenv("RAG_IVF_NLIST", "0")) # IVF lists, 0 = about 4 * sqrt(vectors)
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8")) # IVF lists scanned per query
+RAG_HNSW_M = int(os.getenv("RAG_HNSW_M", "32")) # HNSW graph degree
+RAG_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64")) # HNSW search breadth
+RAG_PQ_M = int(os.getenv("RAG_PQ_M", "16")) # Product-quantizer sub-vectors (must divide the embedding size)
+RAG_MMAP_INDEX = os.getenv("RAG_MMAP_INDEX", "true").lower() == "true" # Memory-map the index at startup
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid").lower() # 'hybrid' (BM25 + vector), 'vector' or 'keyword'
+RAG_EMBED_TIMEOUT = float(os.getenv("RAG_EMBED_TIMEOUT", "2.0")) # Seconds to wait for a query embedding before answering from keywords only
+RAG_EMBED_RETRY_AFTER = float(os.getenv("RAG_EMBED_RETRY_AFTER", "30")) # Seconds to skip the embedding backend after it fails or times out
+RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "256")) # Query embeddings kept in memory (0 disables)
+RAG_RESULT_CACHE_SIZE = int(os.getenv("RAG_RESULT_CACHE_SIZE", "128")) # Retrieval results kept until the index changes (0 disables)
@@ -0,0 +1,15 @@
+import os
+from contextlib import contextmanager
+
+@contextmanager
+def atomic_write(path, mode="w", encoding="utf-8"):
+    """
+    Opens a temp file next to `path` and moves it over `path` once the block
+    finishes, so a crash mid-write leaves the previous file intact.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, mode, encoding=None if "b" in mode else encoding) as f:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -0,0 +1,46 @@
+import hashlib
+import numpy as np
+from PIL import Image
+
+def grid_signature(image, size=64):
+    """
+    Grayscale `size` x `size` box-filtered thumbnail of a PIL image or capture Frame.
+    Cheap to compute and stable across identical screens.
+    """
+    if hasattr(image, "bgra"):
+        # Green channel is a good enough luminance proxy and avoids a full colour conversion
+        small = Image.fromarray(image.bgra[..., 1]).resize((size, size), Image.BOX)
+    else:
+        small = image.resize((size, size), Image.BOX).convert("L")
+    return np.asarray(small, dtype=np.uint8)
+
+def pixel_digest(image):
+    """Hash of every pixel of a PIL image or capture Frame: equal only for identical screens."""
+    digest = hashlib.blake2b(digest_size=16)
+    if hasattr(image, "bgra"):
+        digest.update(f"{image.width}x{image.height}:".encode("ascii"))
+        digest.update(image.raw)
+    else:
+        digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode("ascii"))
+        digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def changed_fraction(a, b, tolerance=2):
+    """Fraction of grid cells whose brightness differs by more than `tolerance`."""
+    if a.shape != b.shape:
+        return 1.0
+    diff = np.abs(a.astype(np.int16) - b.astype(np.int16))
+    return float(np.count_nonzero(diff > tolerance)) / diff.size
+
+def dhash(image, hash_size=8):
+    """64-bit difference hash of a PIL image; near-identical images differ in few bits."""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
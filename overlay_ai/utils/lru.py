@@ -0,0 +1,48 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """Small thread-safe least-recently-used map with hit/miss counters."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def touch(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+
+    def items(self):
+        """Snapshot of (key, value) pairs, most recently used first."""
+        with self._lock:
+            return list(reversed(self._data.items()))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
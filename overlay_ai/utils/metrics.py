@@ -0,0 +1,63 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Process-wide latency and counter registry.
+# Services record into it from any thread; the UI or the console can read a snapshot.
+_lock = threading.Lock()
+_timings = {}
+_counters = {}
+
+def record_timing(name, seconds):
+    """Adds one latency sample (in seconds) under `name`."""
+    with _lock:
+        stats = _timings.get(name)
+        if stats is None:
+            stats = {"count": 0, "total": 0.0, "min": seconds, "max": seconds, "last": seconds}
+            _timings[name] = stats
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["min"] = min(stats["min"], seconds)
+        stats["max"] = max(stats["max"], seconds)
+        stats["last"] = seconds
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+@contextmanager
+def timed(name):
+    """Context manager that records the wall-clock time of its body."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+def snapshot():
+    """Returns a copy of all timings and counters."""
+    with _lock:
+        timings = {}
+        for name, stats in _timings.items():
+            entry = dict(stats)
+            entry["avg"] = stats["total"] / stats["count"] if stats["count"] else 0.0
+            timings[name] = entry
+        return {"timings": timings, "counters": dict(_counters)}
+
+def format_report():
+    """Human readable dump, one metric per line."""
+    data = snapshot()
+    lines = []
+    for name, s in sorted(data["timings"].items()):
+        lines.append(
+            f"{name}: n={s['count']} avg={s['avg'] * 1000:.1f}ms "
+            f"min={s['min'] * 1000:.1f}ms max={s['max'] * 1000:.1f}ms last={s['last'] * 1000:.1f}ms"
+        )
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"{name}: {value}")
+    return "\n".join(lines)
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
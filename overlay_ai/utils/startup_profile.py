@@ -0,0 +1,86 @@
+import importlib.abc
+import os
+import sys
+import threading
+import time
+
+# Startup profiling (OVERLAY_PROFILE_STARTUP=1).
+# Times every module import and prints the slowest ones together with the
+# startup.* service timings once the app has warmed up. Kept stdlib-only so it
+# can be installed before anything else is imported.
+
+PROCESS_START = time.perf_counter()
+ENABLED = os.getenv("OVERLAY_PROFILE_STARTUP", "").lower() in ("1", "true", "yes")
+
+_self_times = {}
+_cumulative = {}
+_local = threading.local()
+_lock = threading.Lock()
+
+class _TimedLoader:
+    """Wraps a loader so exec_module is timed; everything else is delegated."""
+
+    def __init__(self, loader, name):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, item):
+        return getattr(self._loader, item)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with _lock:
+                _self_times[self._name] = elapsed - children
+                _cumulative[self._name] = elapsed
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, fullname)
+        return spec
+
+def install():
+    """Starts timing imports if OVERLAY_PROFILE_STARTUP is set."""
+    if ENABLED and not any(isinstance(f, _ImportTimer) for f in sys.meta_path):
+        sys.meta_path.insert(0, _ImportTimer())
+
+def since_start():
+    return time.perf_counter() - PROCESS_START
+
+def format_report(limit=25):
+    with _lock:
+        modules = sorted(_cumulative.items(), key=lambda item: item[1], reverse=True)[:limit]
+        packages = {}
+        for name, self_time in _self_times.items():
+            top = name.split(".")[0]
+            packages[top] = packages.get(top, 0.0) + self_time
+
+    lines = ["--- Startup profile ---", "Slowest imports (cumulative / self):"]
+    for name, cumulative in modules:
+        lines.append(f"  {name}: {cumulative * 1000:.1f}ms / {_self_times[name] * 1000:.1f}ms")
+    lines.append("Import time by package:")
+    for name, total in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]:
+        lines.append(f"  {name}: {total * 1000:.1f}ms")
+    return "\n".join(lines)
@@ -0,0 +1,52 @@
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from overlay_ai.services import rag_service
+
+
+class FakeOpenAIEmbeddings(DeterministicFakeEmbedding):
+    # Named like the real model so the cache namespace is "openai:text-embedding-ada-002"
+    model: str = "text-embedding-ada-002"
+
+
+def test_ingest_txt_and_retrieve(tmp_path, monkeypatch):
+    # Offline embeddings and a throwaway index/cache, so nothing touches the real store
+    monkeypatch.setattr(rag_service, "INDEX_PATH", str(tmp_path / "faiss_index"))
+    monkeypatch.setattr(rag_service, "EMBEDDING_CACHE_PATH", str(tmp_path / "embedding_cache"))
+    monkeypatch.setattr(rag_service, "AI_PROVIDER", "openai")
+    monkeypatch.setattr(rag_service, "OpenAIEmbeddings", lambda **kwargs: FakeOpenAIEmbeddings(size=32))
+
+    manual = tmp_path / "manual.txt"
+    manual.write_text(
+        "To reset the printer, hold the power button for ten seconds.\n\n"
+        "Replace the toner cartridge when the orange light blinks.\n",
+        encoding="utf-8"
+    )
+
+    service = rag_service.RAGService()
+    result = service.ingest_file(str(manual))
+
+    assert "manual.txt" in str(result)
+    assert [doc["name"] for doc in service.list_documents()] == ["manual.txt"]
+    assert "toner cartridge" in service.retrieve("toner cartridge")
+
+
+def test_reingest_of_uuid_index_adds_no_duplicates(tmp_path, monkeypatch):
+    # An index saved before chunk IDs were content hashes, holding one chunk twice
+    monkeypatch.setattr(rag_service, "INDEX_PATH", str(tmp_path / "faiss_index"))
+    monkeypatch.setattr(rag_service, "EMBEDDING_CACHE_PATH", str(tmp_path / "embedding_cache"))
+    monkeypatch.setattr(rag_service, "AI_PROVIDER", "openai")
+    monkeypatch.setattr(rag_service, "OpenAIEmbeddings", lambda **kwargs: FakeOpenAIEmbeddings(size=32))
+
+    text = "Replace the toner cartridge when the orange light blinks."
+    legacy = FAISS.from_texts([text, text], FakeOpenAIEmbeddings(size=32), ids=["uuid-1", "uuid-2"])
+    legacy.save_local(rag_service.INDEX_PATH)
+
+    manual = tmp_path / "manual.txt"
+    manual.write_text(text, encoding="utf-8")
+    service = rag_service.RAGService()
+    assert service.db.index.ntotal == 1
+
+    service.ingest_file(str(manual))
+    assert service.db.index.ntotal == 1
+    assert list(service.db.index_to_docstore_id.values()) == [rag_service.chunk_id(text)]